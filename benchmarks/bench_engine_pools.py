@@ -0,0 +1,76 @@
+"""Benchmark: database-mode request throughput with each connection pool, under a threaded WSGI server.
+
+The app is served by Werkzeug's threaded server on a local port and fetched by several client threads at once. The
+SQLite database is built from the bundled dataset once and shared by all runs. Run from the project directory:
+
+    python -m benchmarks.bench_engine_pools [requests] [clients]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from werkzeug.serving import make_server
+
+from podcast import create_app
+
+DATA_PATH = Path(__file__).resolve().parent.parent / 'podcast' / 'adapters' / 'data'
+REQUESTS = 600
+CLIENTS = 8
+POOLS = ('null', 'queue')
+PATHS = ('/', '/podcasts', '/description/1', '/description/2', '/description/3')
+
+
+def build_app(database_path: str, pool: str, populate: bool):
+    return create_app({
+        'TESTING': 'True' if populate else 'False',
+        'TEST_DATA_PATH': DATA_PATH,
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}',
+        'SQLALCHEMY_ECHO': False,
+        'SQLALCHEMY_POOL': pool,
+        'SQLALCHEMY_POOL_SIZE': CLIENTS,
+        'SESSION_STATISTICS': False,
+    })
+
+
+def fetch(url: str):
+    with urllib.request.urlopen(url) as response:
+        response.read()
+
+
+def requests_per_second(app, requests: int, clients: int) -> float:
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f'http://127.0.0.1:{server.server_port}{PATHS[i % len(PATHS)]}' for i in range(requests)]
+    try:
+        with ThreadPoolExecutor(clients) as executor:
+            # Warm up every client thread before timing.
+            list(executor.map(fetch, urls[:clients]))
+            start = time.perf_counter()
+            list(executor.map(fetch, urls))
+            return requests / (time.perf_counter() - start)
+    finally:
+        server.shutdown()
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else REQUESTS
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else CLIENTS
+    with tempfile.TemporaryDirectory() as folder:
+        database_path = os.path.join(folder, 'podcasts.db')
+        build_app(database_path, 'null', populate=True)
+        results = {pool: requests_per_second(build_app(database_path, pool, populate=False), requests, clients)
+                   for pool in POOLS}
+
+    print(f"{requests} requests from {clients} client threads, {os.cpu_count()} CPUs")
+    for pool, rate in results.items():
+        print(f"  {pool:<10}{rate:8.1f} requests/s  ({rate / results['null']:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
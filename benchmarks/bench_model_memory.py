@@ -0,0 +1,124 @@
+"""Benchmark: resident memory of a populated MemoryRepository with dict-backed and slotted domain classes.
+
+Each measurement runs in a fresh worker process, so the numbers are what one app worker holds. The slotted variant
+rebuilds Author, Podcast, Category, Episode, Review and Playlist with __slots__. The model keeps them dict-backed:
+the same classes are mapped by the ORM, which keeps instance state in __dict__, and slots save only a few percent
+of the repository's memory. Besides the bundled dataset, a synthetic one is generated by repeating it with fresh ids. Run from
+the project directory:
+
+    python -m benchmarks.bench_model_memory [copies]
+"""
+import csv
+import gc
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+DATA_PATH = Path(__file__).resolve().parent.parent / 'podcast' / 'adapters' / 'data'
+COPIES = 100
+VARIANTS = ('dict', 'slots')
+# Instance attributes of each domain class, used as the slots of the slotted variant.
+SLOTS = {
+    'Author': ('_id', '_name', 'podcast_list'),
+    'Podcast': ('_id', '_author', '_title', '_image', '_description', '_language', '_website', '_itunes_id',
+                'categories', 'episodes', 'reviews', '_version'),
+    'Category': ('_id', '_name'),
+    'Episode': ('_id', '_podcast_id', '_title', '_audio', '_audio_length', '_description', '_pub_date'),
+    'Review': ('_id', '_podcast', '_user', '_rating', '_content'),
+    'Playlist': ('_id', '_owner', '_name', '_episodes'),
+}
+
+
+def rss_mb() -> float:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError('VmRSS is not available')
+
+
+def use_slotted_classes():
+    from podcast.domainmodel import model
+    from podcast.adapters import memoryRepository
+    from podcast.adapters.datareader import csvdatareader
+
+    for name, slots in SLOTS.items():
+        dict_backed = getattr(model, name)
+        namespace = {key: value for key, value in dict_backed.__dict__.items()
+                     if key not in ('__dict__', '__weakref__')}
+        namespace['__slots__'] = slots + ('__weakref__',)
+        slotted = type(name, (object,), namespace)
+        # Methods look up the other classes (for isinstance checks) through the model module's globals.
+        for module in (model, memoryRepository, csvdatareader):
+            if hasattr(module, name):
+                setattr(module, name, slotted)
+
+
+def measure(variant: str, data_path: str):
+    if variant == 'slots':
+        use_slotted_classes()
+    from podcast.adapters.memoryRepository import MemoryRepository, populate
+
+    gc.collect()
+    before = rss_mb()
+    repo = MemoryRepository()
+    populate(repo, data_path)
+    gc.collect()
+    print(f"{rss_mb():.1f} {rss_mb() - before:.1f}")
+
+
+def write_synthetic_dataset(data_folder: str, copies: int):
+    with open(DATA_PATH / 'podcasts.csv', encoding='utf-8', newline='') as source:
+        podcasts = list(csv.reader(source))
+    with open(DATA_PATH / 'episodes.csv', encoding='utf-8', newline='') as source:
+        episodes = list(csv.reader(source))
+    podcast_id_step = max(int(row[0]) for row in podcasts[1:])
+    episode_id_step = max(int(row[0]) for row in episodes[1:])
+
+    with open(os.path.join(data_folder, 'podcasts.csv'), 'w', encoding='utf-8', newline='') as target:
+        writer = csv.writer(target)
+        writer.writerow(podcasts[0])
+        for copy in range(copies):
+            for row in podcasts[1:]:
+                writer.writerow([int(row[0]) + copy * podcast_id_step] + row[1:])
+    with open(os.path.join(data_folder, 'episodes.csv'), 'w', encoding='utf-8', newline='') as target:
+        writer = csv.writer(target)
+        writer.writerow(episodes[0])
+        for copy in range(copies):
+            for row in episodes[1:]:
+                writer.writerow([int(row[0]) + copy * episode_id_step, int(row[1]) + copy * podcast_id_step]
+                                + row[2:])
+
+
+def run_worker(variant: str, data_path) -> tuple:
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_model_memory', '--worker', variant,
+                             str(data_path)], check=True, capture_output=True, text=True).stdout
+    total, repository = output.split()[-2:]
+    return float(total), float(repository)
+
+
+def report(label: str, data_path):
+    print(label)
+    results = {variant: run_worker(variant, data_path) for variant in VARIANTS}
+    for variant, (total, repository) in results.items():
+        print(f"  {variant:<6} worker RSS {total:8.1f} MB   repository {repository:8.1f} MB")
+    saved = results['dict'][1] - results['slots'][1]
+    print(f"  slots save {saved:.1f} MB ({saved / results['dict'][1]:.1%} of the repository)")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        measure(sys.argv[2], sys.argv[3])
+        return
+
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else COPIES
+    report("bundled dataset", DATA_PATH)
+    with tempfile.TemporaryDirectory() as data_folder:
+        write_synthetic_dataset(data_folder, copies)
+        report(f"synthetic dataset ({copies}x)", data_folder)
+
+
+if __name__ == '__main__':
+    main()
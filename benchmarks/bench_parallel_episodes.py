@@ -0,0 +1,61 @@
+"""Benchmark: serial vs. multi-process parsing of episodes.csv across worker counts.
+
+The bundled episodes.csv is small enough that starting worker processes costs more than it saves, so it is repeated
+(with fresh episode ids) into a larger file first. Run from the project directory:
+
+    python -m benchmarks.bench_parallel_episodes [copies]
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from podcast.adapters.datareader.csvdatareader import CSVDataReader, parse_pub_date
+
+DATA_PATH = Path(__file__).resolve().parent.parent / 'podcast' / 'adapters' / 'data'
+COPIES = 20
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+def write_large_episodes_file(data_folder: str, copies: int):
+    with open(DATA_PATH / 'episodes.csv', encoding='utf-8', newline='') as source:
+        rows = list(csv.reader(source))
+    header, rows = rows[0], rows[1:]
+    with open(os.path.join(data_folder, 'episodes.csv'), 'w', encoding='utf-8', newline='') as target:
+        writer = csv.writer(target)
+        writer.writerow(header)
+        episode_id = 0
+        for _ in range(copies):
+            for row in rows:
+                episode_id += 1
+                writer.writerow([episode_id] + row[1:])
+
+
+def timed_read(data_folder: str, workers: int):
+    parse_pub_date.cache_clear()
+    start = time.perf_counter()
+    episodes = list(CSVDataReader(data_folder).iter_episodes(workers))
+    return time.perf_counter() - start, episodes
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else COPIES
+    with tempfile.TemporaryDirectory() as data_folder:
+        write_large_episodes_file(data_folder, copies)
+        size = os.path.getsize(os.path.join(data_folder, 'episodes.csv'))
+
+        serial_seconds, serial = timed_read(data_folder, 1)
+        expected = [(e.id, e.podcast_id, e.title, e.audio, e.audio_length, e.description, e.pub_date) for e in serial]
+        print(f"{len(serial)} episodes, {size / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+        print(f"  workers  1 {serial_seconds * 1000:9.1f} ms")
+        for workers in WORKER_COUNTS[1:]:
+            seconds, episodes = timed_read(data_folder, workers)
+            assert [(e.id, e.podcast_id, e.title, e.audio, e.audio_length, e.description, e.pub_date)
+                    for e in episodes] == expected
+            print(f"  workers {workers:>2} {seconds * 1000:9.1f} ms  ({serial_seconds / seconds:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Micro-benchmark: episode pub_date decoding on the bundled episodes.csv.
+
+Run from the project directory:
+
+    python -m benchmarks.bench_pub_dates
+"""
+import csv
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+from podcast.adapters.datareader import csvdatareader
+from podcast.adapters.datareader.csvdatareader import CSVDataReader, parse_pub_date
+
+DATA_PATH = Path(__file__).resolve().parent.parent / 'podcast' / 'adapters' / 'data'
+REPEAT = 5
+
+
+def strptime_pub_date(pub_date: str) -> datetime:
+    # The decoding CSVDataReader.read_episodes used before parse_pub_date.
+    if pub_date.endswith('+00'):
+        pub_date = pub_date.replace('+00', '+0000')
+    try:
+        return datetime.strptime(pub_date, '%Y-%m-%d %H:%M:%S%z')
+    except ValueError:
+        return datetime.strptime(pub_date, '%Y-%m-%d')
+
+
+def best_of(function) -> float:
+    return min(timeit.repeat(function, number=1, repeat=REPEAT))
+
+
+def main():
+    with open(DATA_PATH / 'episodes.csv', encoding='utf-8') as csv_file:
+        pub_dates = [row[6] for row in list(csv.reader(csv_file))[1:]]
+    assert [parse_pub_date(value) for value in pub_dates] == [strptime_pub_date(value) for value in pub_dates]
+
+    def fast_path_uncached():
+        parse_pub_date.cache_clear()
+        for value in pub_dates:
+            parse_pub_date(value)
+
+    def read_episodes():
+        parse_pub_date.cache_clear()
+        CSVDataReader(DATA_PATH).read_episodes()
+
+    def read_episodes_with_strptime():
+        original = csvdatareader.parse_pub_date
+        csvdatareader.parse_pub_date = strptime_pub_date
+        try:
+            CSVDataReader(DATA_PATH).read_episodes()
+        finally:
+            csvdatareader.parse_pub_date = original
+
+    print(f"{len(pub_dates)} pub_dates, {len(set(pub_dates))} distinct (best of {REPEAT} runs)")
+    print(f"  strptime                 {best_of(lambda: [strptime_pub_date(v) for v in pub_dates]) * 1000:8.1f} ms")
+    print(f"  parse_pub_date, cold     {best_of(fast_path_uncached) * 1000:8.1f} ms")
+    print(f"  parse_pub_date, memoised {best_of(lambda: [parse_pub_date(v) for v in pub_dates]) * 1000:8.1f} ms")
+    print("read_episodes")
+    print(f"  with strptime            {best_of(read_episodes_with_strptime) * 1000:8.1f} ms")
+    print(f"  with parse_pub_date      {best_of(read_episodes) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -19,9 +19,33 @@ class Config:
 
     REPOSITORY = environ.get('REPOSITORY')
 
+    # Optional file caching the parsed CSV dataset for memory mode; unset to always parse the CSV files.
+    DATASET_SNAPSHOT_PATH = environ.get('DATASET_SNAPSHOT_PATH')
+
+    # Number of processes parsing episodes.csv; more than 1 only pays off for large files on multi-core machines.
+    CSV_PARSE_WORKERS = int(environ.get('CSV_PARSE_WORKERS') or 1)
+
+    # Print the number of SQL statements and identity-map size of each request in database mode.
+    SESSION_STATISTICS = (environ.get('SESSION_STATISTICS') or '').lower().strip() == 'true'
+
+    # Podcasts on the home page: FEATURED_PODCASTS is 'ids' for those in FEATURED_PODCAST_IDS (a comma-separated
+    # list), or 'top-rated' or 'most-reviewed' for the top of that leaderboard. They are refetched after any write to
+    # the repository, and at least every FEATURED_PODCASTS_TTL seconds.
+    FEATURED_PODCASTS = environ.get('FEATURED_PODCASTS') or 'ids'
+    FEATURED_PODCAST_IDS = environ.get('FEATURED_PODCAST_IDS')
+    FEATURED_PODCASTS_SIZE = int(environ.get('FEATURED_PODCASTS_SIZE') or 10)
+    FEATURED_PODCASTS_TTL = float(environ.get('FEATURED_PODCASTS_TTL') or 300)
+
+    # Seconds browsers and shared caches may reuse a page for visitors who are not logged in before checking its ETag.
+    HTTP_CACHE_MAX_AGE = int(environ.get('HTTP_CACHE_MAX_AGE') or 0)
+
     # Database configuration
     SQLALCHEMY_DATABASE_URI = environ.get('SQLALCHEMY_DATABASE_URI')
 
+    # Connection pool used in database mode: 'null' (a new connection per session) or 'queue'.
+    SQLALCHEMY_POOL = environ.get('SQLALCHEMY_POOL') or 'null'
+    SQLALCHEMY_POOL_SIZE = int(environ.get('SQLALCHEMY_POOL_SIZE') or 5)
+
     echo_string = environ.get('SQLALCHEMY_ECHO')
     SQLALCHEMY_ECHO = False
     if echo_string.lower().strip() == "true":
@@ -1,15 +1,19 @@
 """Initialize Flask app."""
 
 
-from flask import Flask
+from flask import Flask, request
 from pathlib import Path
 
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import inspect
 from sqlalchemy.orm import sessionmaker, clear_mappers, registry
-from sqlalchemy.pool import NullPool
 
-from podcast.adapters.memoryRepository import MemoryRepository, populate
-from podcast.adapters.orm import metadata, map_model_to_tables
+import podcast.adapters.memoryRepository as memory_repository
+import podcast.adapters.databaseRepository as database_repository
+from podcast.adapters.memoryRepository import MemoryRepository
+from podcast.adapters.datareader.csvdatareader import CSVDataReader
+from podcast.adapters.databaseEngine import create_database_engine
+from podcast.adapters.snapshot import load_snapshot, save_snapshot
+from podcast.adapters.orm import metadata, map_model_to_tables, create_missing_schema
 from podcast.catalogue.catalogue import create_catalogue_blueprint
 from podcast.description.description import create_podcast_description_blueprint
 from podcast.search.search import create_podcast_search_blueprint
@@ -17,8 +21,12 @@ from podcast.search.search import create_podcast_search_blueprint
 from podcast.authentication.authentication import create_authentication_blueprint
 from podcast.playlist.playlist import create_playlist_blueprint
 from podcast.home.home import create_home_blueprint
+from podcast.home.services import create_featured_podcasts
+from podcast.leaderboard.leaderboard import create_leaderboard_blueprint
 
-from podcast.adapters.databaseRepository import SqlAlchemyRepository, populate_database
+from podcast.adapters.databaseRepository import SqlAlchemyRepository
+from podcast.startup import StartupTimer
+from podcast.httpcache import register_http_caching
 
 
 def create_app(test_config=None):
@@ -35,43 +43,92 @@ def create_app(test_config=None):
         app.config.from_mapping(test_config)
         data_path = app.config['TEST_DATA_PATH']
 
-    # Use the passed repo_instance if provided, otherwise create a new one.
+    # Only the repository selected by REPOSITORY is built, and the CSV dataset is parsed only if that repository
+    # needs filling: always in memory mode, but in database mode only when (re)populating the tables.
+    timer = StartupTimer()
+    if app.config['REPOSITORY'] == 'database':
+        repo_instance = create_database_repository(app, data_path, timer)
+        register_session_teardown(app, repo_instance)
+    else:
+        repo_instance = create_memory_repository(data_path, app.config.get('DATASET_SNAPSHOT_PATH'),
+                                                 app.config.get('CSV_PARSE_WORKERS', 1), timer)
+
+    with timer.phase('blueprint registration'):
+        with app.app_context():
+            # Register blueprints with the repository instance.
+            featured_podcasts = create_featured_podcasts(repo_instance, app.config)
+            app.register_blueprint(create_home_blueprint(featured_podcasts))
+            app.register_blueprint(create_catalogue_blueprint(repo_instance))
+            app.register_blueprint(create_podcast_description_blueprint(repo_instance))
+            app.register_blueprint(create_podcast_search_blueprint(repo_instance))
+            app.register_blueprint(create_authentication_blueprint(repo_instance))
+            app.register_blueprint(create_playlist_blueprint(repo_instance))
+            app.register_blueprint(create_leaderboard_blueprint(repo_instance))
+            register_http_caching(app, repo_instance, data_path)
+
+    app.config['STARTUP_TIMINGS'] = timer.timings
+    print(timer.report())
 
+    return app
+
+
+def register_session_teardown(app, repo_instance: SqlAlchemyRepository):
+    # Each request gets its own database session, opened on first use and removed once the request is over.
+    @app.teardown_request
+    def close_database_session(exception=None):
+        if app.config.get('SESSION_STATISTICS'):
+            statistics = repo_instance.session_statistics()
+            print(f"SESSION STATISTICS: {request.method} {request.path}: {statistics.query_count} queries, "
+                  f"{statistics.identity_map_size} objects in identity map")
+        repo_instance.close_session()
+
+
+def create_memory_repository(data_path, snapshot_path, parse_workers: int, timer: StartupTimer) -> MemoryRepository:
+    # Create the MemoryRepository implementation for a memory-based repository.
     repo_instance = MemoryRepository()
-    populate(repo_instance, data_path)
-
-    if app.config['REPOSITORY'] == 'memory':
-        # Create the MemoryRepository implementation for a memory-based repository.
-        repo_instance = MemoryRepository()
-        if repo_instance:
-            print('using memory')
-        # fill the content of the repository from the provided csv files (has to be done every time we start app!)
-        # database_mode = False
-        populate(repo_instance, data_path)
-
-    elif app.config['REPOSITORY'] == 'database':
+    print('using memory')
+
+    # A snapshot taken from the current csv files already holds the populated and linked repository.
+    if snapshot_path:
+        with timer.phase('snapshot load'):
+            if load_snapshot(repo_instance, snapshot_path, data_path):
+                return repo_instance
+
+    # fill the content of the repository from the provided csv files (has to be done every time we start app!)
+    # Parsing is streamed into the repository; the time spent reading rows is reported as its own phase.
+    csv_reader = CSVDataReader(data_path)
+    with timer.phase('repository population'):
+        memory_repository.load_data(repo_instance, timer.iterate(csv_reader.iter_podcasts(), 'CSV parse'),
+                                    timer.iterate(csv_reader.iter_episodes(parse_workers), 'CSV parse'))
+    with timer.phase('linking'):
+        memory_repository.link_episodes(repo_instance)
+
+    if snapshot_path:
+        with timer.phase('snapshot save'):
+            save_snapshot(repo_instance, snapshot_path, data_path)
+    return repo_instance
+
+
+def create_database_repository(app, data_path, timer: StartupTimer) -> SqlAlchemyRepository:
+    with timer.phase('database schema'):
         # Configure database.
         database_uri = app.config['SQLALCHEMY_DATABASE_URI']
-
-
         database_echo = app.config['SQLALCHEMY_ECHO']
-        # Please do not change the settings for connect_args and poolclass!
-        database_engine = create_engine(database_uri, connect_args={"check_same_thread": False}, poolclass=NullPool,
-                                        echo=database_echo)
+        database_engine = create_database_engine(database_uri, database_echo, app.config.get('SQLALCHEMY_POOL', 'null'),
+                                                 app.config.get('SQLALCHEMY_POOL_SIZE', 5))
 
         # Create the database session factory using sessionmaker (this has to be done once, in a global manner)
         session_factory = sessionmaker(autocommit=False, autoflush=True, bind=database_engine)
         # Create the SQLAlchemy DatabaseRepository instance for an sqlite3-based repository.
         repo_instance = SqlAlchemyRepository(session_factory)
-        if repo_instance:
-            print("using database")
+        print("using database")
 
         inspector = inspect(database_engine)
         tables = inspector.get_table_names()
 
+        clear_mappers()
         if app.config['TESTING'] == 'True':
             print("TESTING MODE: REPOPULATING DATABASE...")
-            clear_mappers()
             metadata.create_all(database_engine)
 
             with database_engine.connect() as connection:
@@ -83,29 +140,26 @@ def create_app(test_config=None):
                 except:
                     trans.rollback()
                     raise
-
-            map_model_to_tables()
-            populate_database(repo_instance, data_path)
-            print("REPOPULATING DATABASE... FINISHED")
+            populate = True
+        elif not tables:
+            print("FIRST-TIME SETUP: CREATING TABLES AND POPULATING DATABASE...")
+            metadata.create_all(database_engine)
+            populate = True
         else:
-            if not tables:
-                print("FIRST-TIME SETUP: CREATING TABLES AND POPULATING DATABASE...")
-                clear_mappers()
-                metadata.create_all(database_engine)
-
-                map_model_to_tables()
-                populate_database(repo_instance, data_path)
-                print("FIRST-TIME SETUP... FINISHED")
-            else:
-                map_model_to_tables()
-
-    with app.app_context():
-        # Register blueprints with the repository instance.
-        app.register_blueprint(create_home_blueprint(repo_instance))
-        app.register_blueprint(create_catalogue_blueprint(repo_instance))
-        app.register_blueprint(create_podcast_description_blueprint(repo_instance))
-        app.register_blueprint(create_podcast_search_blueprint(repo_instance))
-        app.register_blueprint(create_authentication_blueprint(repo_instance))
-        app.register_blueprint(create_playlist_blueprint(repo_instance))
-
-    return app
+            # Databases created by an earlier version get any new tables and indexes added.
+            with database_engine.begin() as connection:
+                create_missing_schema(connection)
+            populate = False
+        map_model_to_tables()
+
+    if populate:
+        csv_reader = CSVDataReader(data_path)
+        episodes = csv_reader.iter_episodes(app.config.get('CSV_PARSE_WORKERS', 1))
+        with timer.phase('database population'):
+            database_repository.load_data(timer.iterate(csv_reader.iter_podcasts(), 'CSV parse'),
+                                          timer.iterate(episodes, 'CSV parse'), repo_instance)
+        print("POPULATING DATABASE... FINISHED")
+    # Requests start with a fresh session rather than the one used to set up the database.
+    repo_instance.close_session()
+
+    return repo_instance
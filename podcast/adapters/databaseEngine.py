@@ -0,0 +1,49 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+# Connection pools that SQLALCHEMY_POOL can select.
+POOL_CLASSES = {
+    # A new connection for every session checkout.
+    'null': NullPool,
+    # Up to pool_size connections shared by all threads.
+    'queue': QueuePool,
+}
+# SingletonThreadPool is left out: once more than pool_size threads have connected it closes connections other
+# threads are still using, which breaks requests under a server that starts a thread per request.
+
+# SQLite settings applied to every new connection. WAL lets requests read while another writes, and with WAL a
+# synchronous level of NORMAL only risks the last transactions on power loss, not corruption.
+SQLITE_CONNECTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': '268435456',
+    'cache_size': '-16384',
+    'temp_store': 'MEMORY',
+}
+
+
+def _apply_connection_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_CONNECTION_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+def create_database_engine(database_uri: str, echo: bool = False, pool: str = 'null', pool_size: int = 5) -> Engine:
+    """ Creates the engine for database mode, using the connection pool named by pool (see POOL_CLASSES).
+
+    SQLite connections are tuned with SQLITE_CONNECTION_PRAGMAS as they are opened, so a pooled connection only
+    pays for this once.
+    """
+    if pool not in POOL_CLASSES:
+        raise ValueError(f"Unknown connection pool: {pool}")
+    options = {'poolclass': POOL_CLASSES[pool], 'echo': echo}
+    if pool == 'queue':
+        options['pool_size'] = pool_size
+    engine = create_engine(database_uri, connect_args={"check_same_thread": False}, **options)
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _apply_connection_pragmas)
+    return engine
@@ -1,16 +1,75 @@
-from typing import List
-from sqlalchemy.orm import scoped_session
+import re
+import secrets
+import threading
+from itertools import islice
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy.orm import scoped_session, selectinload
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy import func
+from sqlalchemy import event, exists, func, literal, select, tuple_
 
 from podcast.adapters.datareader.csvdatareader import CSVDataReader
-from podcast.domainmodel.model import Podcast, Episode, Author, Category, Review, Playlist, User
-from podcast.adapters.repository import AbstractRepository
+from podcast.domainmodel.model import Podcast, Episode, Author, Category, Review, Playlist, User, RatingSummary, \
+    normalise_username, RATINGS
+from podcast.adapters.repository import AbstractRepository, Page, PodcastCursor, LeaderboardEntry, podcast_cursor, \
+    SEARCH_TITLE, SEARCH_AUTHOR, SEARCH_CATEGORY, SEARCH_LANGUAGE, LEADERBOARD_TOP_RATED, LEADERBOARD_MOST_REVIEWED
+from podcast.adapters.orm import podcast_search_table, authors_table, categories_table, podcasts_table, \
+    podcast_categories_table, episodes_table, podcast_ratings_table, podcast_average_rating, repository_version_table, \
+    podcast_search_rebuilt_after
+
+# Orders of the leaderboards, matching the indexes on podcast_ratings.
+_leaderboard_orders = {
+    LEADERBOARD_TOP_RATED: (podcast_average_rating.desc(), podcast_ratings_table.c.review_count.desc(),
+                            podcast_ratings_table.c.podcast_id),
+    LEADERBOARD_MOST_REVIEWED: (podcast_ratings_table.c.review_count.desc(), podcast_ratings_table.c.podcast_id),
+}
+
+# Columns of podcast_search holding each search field.
+_search_columns = {
+    SEARCH_TITLE: podcast_search_table.c.title,
+    SEARCH_AUTHOR: podcast_search_table.c.author,
+    SEARCH_CATEGORY: podcast_search_table.c.categories,
+    SEARCH_LANGUAGE: podcast_search_table.c.language,
+}
+
+# Characters dropped from search queries: SQLite ends a string at a NUL byte, leaving an FTS5 phrase unterminated.
+_CONTROL_CHARACTERS = re.compile(r'[\x00-\x1f\x7f]')
+
+
+def _search_condition(query: str, field: str):
+    if field not in _search_columns:
+        raise ValueError(f"Unknown search field: {field}")
+    column = _search_columns[field]
+    query = _CONTROL_CHARACTERS.sub('', query)
+    if len(query) >= 3:
+        # A quoted phrase is matched as a substring by the trigram tokenizer.
+        return column.op('MATCH')('"' + query.replace('"', '""') + '"')
+    # Shorter queries have no trigrams to look up, so fall back to LIKE over the search table.
+    pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    return column.ilike(pattern, escape='\\')
+
+
+class SessionStatistics(NamedTuple):
+    """ What the current thread's session has done since it was opened. """
+    # Number of objects held in the session's identity map.
+    identity_map_size: int
+    # Number of SQL statements executed.
+    query_count: int
+
 
 class SessionContextManager:
+    """ Hands out one session per thread, opened on first use and discarded by close_current_session.
+
+    In the web app close_current_session is called when each request ends, so no identity map outlives its request.
+    """
+
     def __init__(self, session_factory):
         self.__session_factory = session_factory
         self.__session = scoped_session(self.__session_factory)
+        # Statements are counted per thread, matching the thread-scoped sessions.
+        self.__counts = threading.local()
+        bind = session_factory.kw.get('bind')
+        if bind is not None:
+            event.listen(bind, 'before_cursor_execute', self.__count_statement)
 
     def __enter__(self):
         return self
@@ -29,14 +88,21 @@ class SessionContextManager:
         self.__session.rollback()
 
     def reset_session(self):
-        # This method can be used e.g., to allow Flask to start a new session for each HTTP request,
-        # via the 'before_request' callback.
         self.close_current_session()
         self.__session = scoped_session(self.__session_factory)
 
     def close_current_session(self):
         if self.__session is not None:
-            self.__session.close()
+            # Closes the thread's session and forgets it, so the next use opens a new one with an empty identity map.
+            self.__session.remove()
+        self.__counts.queries = 0
+
+    def statistics(self) -> SessionStatistics:
+        identity_map_size = len(self.__session().identity_map) if self.__session.registry.has() else 0
+        return SessionStatistics(identity_map_size, getattr(self.__counts, 'queries', 0))
+
+    def __count_statement(self, connection, cursor, statement, parameters, context, executemany):
+        self.__counts.queries = getattr(self.__counts, 'queries', 0) + 1
 
 
 class SqlAlchemyRepository(AbstractRepository):
@@ -49,10 +115,19 @@ class SqlAlchemyRepository(AbstractRepository):
     def reset_session(self):
         self._session_cm.reset_session()
 
+    def session_statistics(self) -> SessionStatistics:
+        return self._session_cm.statistics()
+
+    def get_change_version(self) -> int:
+        version = self._session_cm.session.execute(
+            select(repository_version_table.c.version).where(repository_version_table.c.id == 1)).scalar()
+        return version or 0
+
     # Podcast methods
     def add_podcast(self, podcast: Podcast):
         with self._session_cm as scm:
             scm.session.add(podcast)
+            _bump_change_version(scm.session)
             scm.commit()
 
     def get_podcast(self, podcast_id: int) -> Podcast:
@@ -63,14 +138,86 @@ class SqlAlchemyRepository(AbstractRepository):
             pass
         return podcast
 
+    def get_podcasts_by_letter(self, letter: str, limit: int, after: PodcastCursor = None) -> Page:
+        session = self._session_cm.session
+        title_key = func.lower(Podcast._title)
+        podcasts = session.query(Podcast).filter(podcasts_table.c.first_letter == letter)
+        if after is not None:
+            # The cursor title is lowered by the database too, as SQLite's lower() only changes ASCII letters. The plain
+            # bound on title_key lets SQLite seek into ix_podcasts_first_letter; the row value alone does not.
+            after_key = func.lower(literal(after[0]))
+            podcasts = podcasts.filter(title_key >= after_key,
+                                       tuple_(title_key, Podcast._id) > tuple_(after_key, literal(after[1])))
+        # Fetching one row past the page tells us whether there is a next page.
+        items = podcasts.order_by(title_key, Podcast._id).limit(limit + 1).all()
+        next_cursor = podcast_cursor(items[limit - 1]) if len(items) > limit else None
+        total = session.query(func.count()).select_from(podcasts_table) \
+            .filter(podcasts_table.c.first_letter == letter).scalar()
+        return Page(items[:limit], total, next_cursor)
+
+    def get_podcast_details(self, podcast_id: int) -> Podcast:
+        # Four queries in all: the podcast with its author, then its categories, episodes, and reviews with their
+        # users (Podcast._author and Review._user are joined by the mapping).
+        return self._session_cm.session.query(Podcast) \
+            .filter(Podcast._id == podcast_id) \
+            .options(selectinload(Podcast.categories), selectinload(Podcast.episodes), selectinload(Podcast.reviews)) \
+            .one_or_none()
+
+    def get_podcasts_by_ids(self, podcast_ids: Sequence[int]) -> List[Podcast]:
+        podcasts = {podcast.id: podcast for podcast in self._session_cm.session.query(Podcast)
+                    .filter(Podcast._id.in_(podcast_ids))}
+        return [podcasts[podcast_id] for podcast_id in podcast_ids if podcast_id in podcasts]
+
     def get_all_podcasts(self) -> List[Podcast]:
         podcasts = self._session_cm.session.query(Podcast).all()
         return podcasts
 
+    def search_podcasts(self, query: str, field: str, offset: int = 0, limit: int = None) -> List[Podcast]:
+        podcasts = self._search_query(query, field)
+        return podcasts.order_by(Podcast._title, Podcast._id).offset(offset).limit(limit).all()
+
+    def count_search_results(self, query: str, field: str) -> int:
+        return self._session_cm.session.query(func.count()).select_from(podcast_search_table) \
+            .filter(_search_condition(query, field)).scalar()
+
+    def search_podcasts_page(self, query: str, field: str, limit: int, offset: int = 0,
+                             after: PodcastCursor = None) -> Page:
+        podcasts = self._search_query(query, field)
+        if after is not None:
+            podcasts = podcasts.filter(Podcast._title >= after[0], tuple_(Podcast._title, Podcast._id) > tuple_(*after))
+            offset = 0
+        # Fetching one row past the page tells us whether there is a next page.
+        items = podcasts.order_by(Podcast._title, Podcast._id).offset(offset).limit(limit + 1).all()
+        next_cursor = podcast_cursor(items[limit - 1]) if len(items) > limit else None
+        return Page(items[:limit], self.count_search_results(query, field), next_cursor)
+
+    def _search_query(self, query: str, field: str):
+        return self._session_cm.session.query(Podcast) \
+            .join(podcast_search_table, podcast_search_table.c.rowid == Podcast._id) \
+            .filter(_search_condition(query, field))
+
+    def get_previous_and_next_podcast_ids(self, podcast_id: int) -> Tuple[Optional[int], Optional[int]]:
+        session = self._session_cm.session
+        title_key = func.lower(Podcast._title)
+        key = session.query(title_key, Podcast._id).filter(Podcast._id == podcast_id).one_or_none()
+        if key is None:
+            return None, None
+
+        # Each neighbour is a one-row range search of the ix_podcasts_title_lower index. The plain title_key bound is
+        # what lets SQLite seek into the index; the row-value comparison alone would scan it from one end.
+        previous_id = session.query(Podcast._id) \
+            .filter(title_key <= key[0], tuple_(title_key, Podcast._id) < tuple_(*key)) \
+            .order_by(title_key.desc(), Podcast._id.desc()).limit(1).scalar()
+        next_id = session.query(Podcast._id) \
+            .filter(title_key >= key[0], tuple_(title_key, Podcast._id) > tuple_(*key)) \
+            .order_by(title_key, Podcast._id).limit(1).scalar()
+        return previous_id, next_id
+
     # Episode methods
     def add_episode(self, episode: Episode):
         with self._session_cm as scm:
             scm.session.add(episode)
+            _bump_change_version(scm.session)
             scm.commit()
 
     def get_episode(self, episode_id: int) -> Episode:
@@ -85,18 +232,21 @@ class SqlAlchemyRepository(AbstractRepository):
         with self._session_cm as scm:
             playlist.add_episode(episode)
             scm.session.add(playlist)
+            _bump_change_version(scm.session)
             scm.commit()
 
     def remove_episode_from_playlist(self, episode: Episode, playlist: Playlist):
         with self._session_cm as scm:
             playlist.remove_episode(episode)
             scm.session.add(playlist)
+            _bump_change_version(scm.session)
             scm.commit()
 
     # Author methods
     def add_author(self, author: Author):
         with self._session_cm as scm:
             scm.session.add(author)
+            _bump_change_version(scm.session)
             scm.commit()
 
     def get_author(self, author_id: int) -> Author:
@@ -111,6 +261,7 @@ class SqlAlchemyRepository(AbstractRepository):
     def add_category(self, category: Category):
         with self._session_cm as scm:
             scm.session.add(category)
+            _bump_change_version(scm.session)
             scm.commit()
 
     def get_category(self, category_id: int) -> Category:
@@ -129,12 +280,14 @@ class SqlAlchemyRepository(AbstractRepository):
     def add_review(self, review: Review):
         with self._session_cm as scm:
             scm.session.add(review)
+            _bump_change_version(scm.session)
             scm.commit()
 
     def add_review_to_podcast(self, review: Review, podcast: Podcast):
         with self._session_cm as scm:
             podcast.add_review(review)
             scm.session.add(podcast)
+            _bump_change_version(scm.session)
             scm.commit()
 
     def get_next_review_id(self) -> int:
@@ -153,10 +306,44 @@ class SqlAlchemyRepository(AbstractRepository):
         reviews = self._session_cm.session.query(Review).filter(Review._podcast_id == podcast_id).all()
         return reviews
 
+    def get_rating_summary(self, podcast_id: int) -> RatingSummary:
+        columns = podcast_ratings_table.c
+        row = self._session_cm.session.execute(
+            select(columns.review_count, columns.rating_total, *[columns[f'rating_{rating}'] for rating in RATINGS])
+            .where(columns.podcast_id == podcast_id)).first()
+        if row is None:
+            return RatingSummary()
+        return RatingSummary(row[0], row[1], tuple(row[2:]))
+
+    def get_leaderboard(self, leaderboard: str, limit: int, category: str = None,
+                        language: str = None) -> List[LeaderboardEntry]:
+        if leaderboard not in _leaderboard_orders:
+            raise ValueError(f"Unknown leaderboard: {leaderboard}")
+        columns = podcast_ratings_table.c
+        query = select(columns.podcast_id, columns.review_count, columns.rating_total,
+                       *[columns[f'rating_{rating}'] for rating in RATINGS]).where(columns.review_count > 0)
+        # Rows are read in leaderboard order from the index, and each is checked against the category or language
+        # by primary key, until limit of them have matched.
+        if category:
+            query = query.where(exists().where(
+                podcast_categories_table.c.podcast_id == columns.podcast_id,
+                podcast_categories_table.c.category_id.in_(
+                    select(categories_table.c.id).where(categories_table.c.name == category))))
+        elif language:
+            query = query.where(exists().where(podcasts_table.c.id == columns.podcast_id,
+                                               func.lower(podcasts_table.c.language) == func.lower(literal(language))))
+        rows = self._session_cm.session.execute(
+            query.order_by(*_leaderboard_orders[leaderboard]).limit(limit)).all()
+
+        # SQLite does not enforce the key from podcast_ratings to podcasts, so a row may have no podcast to show.
+        ratings = {row[0]: RatingSummary(row[1], row[2], tuple(row[3:])) for row in rows}
+        return [LeaderboardEntry(podcast, ratings[podcast.id]) for podcast in self.get_podcasts_by_ids(list(ratings))]
+
     # Playlist methods
     def add_playlist(self, playlist: Playlist):
         with self._session_cm as scm:
             scm.session.add(playlist)
+            _bump_change_version(scm.session)
             scm.commit()
 
     def get_playlist(self, playlist_id: int) -> Playlist:
@@ -171,19 +358,26 @@ class SqlAlchemyRepository(AbstractRepository):
         max_id = self._session_cm.session.query(func.max(Playlist._id)).scalar()
         return (max_id or 0) + 1
 
+    def _playlists_owned_by(self, user: User):
+        # Uses ix_playlists_owner_id; the episodes of every matched playlist are loaded in one further query rather
+        # than lazily, since the playlist and description pages render them straight away.
+        return self._session_cm.session.query(Playlist) \
+            .filter(Playlist._owner == user) \
+            .options(selectinload(Playlist._episodes)) \
+            .order_by(Playlist._id)
+
     def get_playlist_by_user(self, user: User) -> Playlist:
-        playlist = None
-        try:
-            playlist = self._session_cm.session.query(Playlist).filter(Playlist._owner == user).one()
-        except NoResultFound:
-            pass
-        return playlist
+        return self._playlists_owned_by(user).first()
+
+    def get_playlists_by_user(self, user: User) -> List[Playlist]:
+        return self._playlists_owned_by(user).all()
 
     # User methods
     def add_user(self, user: User):
         print("called add user")
         with self._session_cm as scm:
             scm.session.add(user)
+            _bump_change_version(scm.session)
             scm.commit()
 
     def get_user(self, user_id: int) -> User:
@@ -202,70 +396,122 @@ class SqlAlchemyRepository(AbstractRepository):
 
     def get_user_by_username(self, username: str) -> User:
         print('called "get user by username"')
-        user = None
+        # A single query, answered from the unique index on users.username.
+        return self._session_cm.session.query(User).filter(User._username == normalise_username(username)) \
+            .one_or_none()
+
+
+# SQLite settings used while bulk loading. The load is a single transaction that is simply rerun if it is
+# interrupted, so durability can be given up until it commits.
+_BULK_LOAD_PRAGMAS = {
+    'journal_mode': 'MEMORY',
+    'synchronous': 'OFF',
+    'cache_size': '-65536',
+}
+
+# Number of podcasts or episodes read from the CSV files and written per executemany while bulk loading.
+BULK_LOAD_CHUNK_SIZE = 5000
+
+
+def _bump_change_version(connection):
+    """ Counts a write in repository_version, within the transaction of connection (or session) making the write. """
+    columns = repository_version_table.c
+    # The row is missing from new databases, and from test databases after their tables are emptied.
+    connection.execute(repository_version_table.insert().prefix_with('OR IGNORE', dialect='sqlite')
+                       .values(id=1, version=0))
+    connection.execute(repository_version_table.update().where(columns.id == 1).values(version=columns.version + 1))
+
+
+def _start_change_version(connection):
+    """ Starts counting writes from a random number, so a newly populated database, say one replacing the file of an
+    earlier one, does not repeat the versions of the database it replaced. """
+    connection.execute(repository_version_table.delete())
+    connection.execute(repository_version_table.insert().values(id=1, version=secrets.randbelow(1 << 31)))
+
+
+def _set_pragmas(connection, pragmas: dict) -> dict:
+    """ Applies the given PRAGMAs outside of any transaction and returns their previous values. """
+    previous = {}
+    for name, value in pragmas.items():
+        previous[name] = connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+        connection.exec_driver_sql(f'PRAGMA {name} = {value}')
+    # SQLAlchemy 2.0 connections begin a transaction on first use; journal_mode cannot change inside one.
+    if connection.in_transaction():
+        connection.commit()
+    return previous
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _insert(connection, table, rows: List[dict]):
+    if rows:
+        connection.execute(table, rows)
+
+
+def load_data(podcasts: Iterable[Podcast], episodes: Iterable[Episode], repo: SqlAlchemyRepository,
+              chunk_size: int = BULK_LOAD_CHUNK_SIZE):
+    # Rows are written with one executemany per table and chunk inside a single transaction, so only chunk_size
+    # objects are held at a time. Authors and categories that are already stored are skipped, as the row-by-row
+    # loader used to do.
+    insert_authors = authors_table.insert().prefix_with('OR IGNORE', dialect='sqlite')
+    insert_categories = categories_table.insert().prefix_with('OR IGNORE', dialect='sqlite')
+    podcast_ids = set()
+
+    engine = repo._session_cm.session.get_bind()
+    with engine.connect() as connection:
+        is_sqlite = connection.dialect.name == 'sqlite'
+        previous_pragmas = _set_pragmas(connection, _BULK_LOAD_PRAGMAS) if is_sqlite else {}
         try:
-            user = self._session_cm.session.query(User).filter(User._username == username).one()
-        except NoResultFound:
-            pass
-        return user
-
-
-def load_data(data_path, repo: SqlAlchemyRepository):
-    # Initialize the CSVDataReader
-    csv_reader = CSVDataReader(data_path)
-    csv_reader.read_podcasts()
-    csv_reader.read_episodes()
-
-    with repo._session_cm as scm:
-        # Add authors
-        for author in csv_reader.authors:
-            existing_author = scm.session.query(Author).filter_by(_id=author.id).first()
-            if not existing_author:
-                scm.session.add(author)
-        scm.commit()
-
-        # Add categories
-        for category in csv_reader.categories:
-            existing_category = scm.session.query(Category).filter_by(_id=category.id).first()
-            if not existing_category:
-                scm.session.add(category)
-        scm.commit()
-
-        # Add podcasts
-        for podcast in csv_reader.podcasts:
-            # Retrieve existing author from the session
-            author = scm.session.query(Author).filter_by(_id=podcast.author.id).first()
-            if author:
-                podcast._author = author
-
-            # Replace categories with those from the session
-            categories = []
-            for category in podcast.categories:
-                cat = scm.session.query(Category).filter_by(_id=category.id).first()
-                if cat:
-                    categories.append(cat)
-            podcast.categories = categories
-
-            scm.session.add(podcast)
-        scm.commit()
-
-        # Add episodes
-        for episode in csv_reader.episodes:
-            # Retrieve existing podcast from the session
-            podcast = scm.session.query(Podcast).filter_by(_id=episode.podcast_id).first()
-
-            # Ensure the podcast exists and associate it with the episode
-            if podcast:
-                episode._podcast = podcast  # Associate the episode with its podcast
-                episode.podcast_id = podcast._id  # Ensure the podcast_id is set correctly
-
-                scm.session.add(episode)  # Add episode to session only if podcast is valid
-            else:
-                print(f"Podcast with id {episode.podcast_id} not found for episode {episode._title}")
-                # Handle the case where the podcast is not found (optional)
-        scm.commit()
+            # The search index is built once at the end instead of by its triggers, row by row.
+            with connection.begin(), podcast_search_rebuilt_after(connection):
+                for chunk in _chunks(podcasts, chunk_size):
+                    authors = {}
+                    categories = []
+                    podcast_rows = []
+                    podcast_categories = []
+                    for podcast in chunk:
+                        if podcast.author is not None:
+                            authors[podcast.author.id] = {'id': podcast.author.id, 'name': podcast.author.name}
+                        podcast_rows.append({
+                            'id': podcast.id, 'author_id': podcast.author.id if podcast.author else None,
+                            'title': podcast.title, 'image': podcast.image, 'description': podcast.description,
+                            'website': podcast.website, 'itunes_id': podcast.itunes_id, 'language': podcast.language,
+                        })
+                        for category in podcast.categories:
+                            categories.append({'id': category.id, 'name': category.name})
+                            podcast_categories.append({'podcast_id': podcast.id, 'category_id': category.id})
+                        podcast_ids.add(podcast.id)
+
+                    _insert(connection, insert_authors, list(authors.values()))
+                    _insert(connection, insert_categories, categories)
+                    _insert(connection, podcasts_table.insert(), podcast_rows)
+                    _insert(connection, podcast_categories_table.insert(), podcast_categories)
+
+                for chunk in _chunks(episodes, chunk_size):
+                    episode_rows = []
+                    for episode in chunk:
+                        if episode.podcast_id not in podcast_ids:
+                            print(f"Podcast with id {episode.podcast_id} not found for episode {episode.title}")
+                            continue
+                        episode_rows.append({
+                            'id': episode.id, 'podcast_id': episode.podcast_id, 'title': episode.title,
+                            'audio_link': episode.audio, 'audio_length': episode.audio_length,
+                            'description': episode.description, 'pub_date': episode.pub_date,
+                        })
+                    _insert(connection, episodes_table.insert(), episode_rows)
+                _start_change_version(connection)
+        finally:
+            if previous_pragmas:
+                _set_pragmas(connection, previous_pragmas)
 
 
 def populate_database(repo: SqlAlchemyRepository, data_path):
-    load_data(data_path, repo)
-
+    csv_reader = CSVDataReader(data_path)
+    load_data(csv_reader.iter_podcasts(), csv_reader.iter_episodes(), repo)
@@ -1,9 +1,135 @@
+import io
 import os
 import csv
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import repeat
+from typing import Iterator, List, Tuple
 
 from podcast.domainmodel.model import Podcast, Episode, Author, Category
 
+# Number of distinct pub_date strings remembered; catalogues often publish many episodes with the same timestamp.
+PUB_DATE_CACHE_SIZE = 8192
+
+_utc_offsets = {}
+
+
+def _utc_offset(sign: str, hours: str, minutes: str) -> timezone:
+    key = (sign, hours, minutes)
+    offset = _utc_offsets.get(key)
+    if offset is None:
+        delta = timedelta(hours=int(hours), minutes=int(minutes))
+        offset = _utc_offsets[key] = timezone(-delta if sign == '-' else delta)
+    return offset
+
+
+@lru_cache(maxsize=PUB_DATE_CACHE_SIZE)
+def parse_pub_date(pub_date: str) -> datetime:
+    """ Converts an episode pub_date, normally 'YYYY-MM-DD HH:MM:SS+HH', to a datetime.
+
+    That format is decoded by slicing. Anything else goes through strptime, accepting '+HHMM' offsets and bare dates.
+    """
+    length = len(pub_date)
+    if (length == 22 or length == 24) and pub_date[10] == ' ' and pub_date[19] in '+-':
+        try:
+            return datetime(int(pub_date[0:4]), int(pub_date[5:7]), int(pub_date[8:10]),
+                            int(pub_date[11:13]), int(pub_date[14:16]), int(pub_date[17:19]),
+                            tzinfo=_utc_offset(pub_date[19], pub_date[20:22], pub_date[22:24] or '0'))
+        except ValueError:
+            pass
+
+    # Preprocess pub_date to replace '+00' with '+0000'
+    if pub_date.endswith('+00'):
+        pub_date = pub_date.replace('+00', '+0000')
+
+    # Convert pub_date from string to datetime using strptime
+    try:
+        return datetime.strptime(pub_date, '%Y-%m-%d %H:%M:%S%z')
+    except ValueError:
+        return datetime.strptime(pub_date, '%Y-%m-%d')
+
+
+# Episode file ranges handed to each worker process, so that a slow range does not hold up the others.
+RANGES_PER_WORKER = 4
+
+_BLOCK_SIZE = 1 << 20
+
+
+def _episode_fields(row) -> tuple:
+    # Episode constructor arguments for one CSV row. Worker processes send these back rather than Episode objects,
+    # which take about twice as long to pickle.
+    episode_id, episode_podcast_id, episode_title, episode_audio, \
+        episode_audio_length, episode_description, episode_pub_date = row
+
+    # Convert values to integer
+    episode_id = int(episode_id) if episode_id else None
+    episode_podcast_id = int(episode_podcast_id) if episode_podcast_id else None
+    episode_audio_length = int(episode_audio_length) if episode_audio_length else None
+
+    episode_pub_date = parse_pub_date(episode_pub_date)
+
+    return (episode_id, episode_podcast_id, episode_audio_length, episode_title,
+            episode_audio, episode_description, episode_pub_date)
+
+
+def _record_ranges(filepath: str, parts: int) -> List[Tuple[int, int]]:
+    """ Splits the records of a CSV file, after its header, into about parts (start, end) byte ranges.
+
+    A range only ends at a line break outside quotes, so descriptions spanning several lines stay whole. Quotes inside
+    a quoted field are doubled, so a line break is outside quotes when an even number of quotes precede it.
+    """
+    size = os.path.getsize(filepath)
+    with open(filepath, 'rb') as file:
+        file.readline()
+        boundaries = [file.tell()]
+        position = boundaries[0]
+        in_quotes = False
+        for part in range(1, parts):
+            target = boundaries[0] + (size - boundaries[0]) * part // parts
+            if target <= boundaries[-1]:
+                continue
+            # Track the quote parity up to the target, then look for the next line break outside quotes.
+            while position < target:
+                block = file.read(min(_BLOCK_SIZE, target - position))
+                in_quotes ^= block.count(b'"') % 2 == 1
+                position += len(block)
+            boundary = None
+            while boundary is None:
+                block = file.read(_BLOCK_SIZE)
+                if not block:
+                    boundary = size
+                    break
+                start = 0
+                while True:
+                    newline = block.find(b'\n', start)
+                    if newline < 0:
+                        in_quotes ^= block.count(b'"', start) % 2 == 1
+                        position += len(block)
+                        break
+                    in_quotes ^= block.count(b'"', start, newline) % 2 == 1
+                    if not in_quotes:
+                        boundary = position + newline + 1
+                        break
+                    start = newline + 1
+            if boundary >= size:
+                break
+            boundaries.append(boundary)
+            position = boundary
+            file.seek(boundary)
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+
+def _read_episode_range(filepath: str, start: int, end: int) -> List[tuple]:
+    # Runs in a worker process. The text is decoded with universal newlines, like the file read by iter_episodes.
+    with open(filepath, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    with io.TextIOWrapper(io.BytesIO(data), encoding='utf-8') as text:
+        return [_episode_fields(row) for row in csv.reader(text)]
+
+
 class CSVDataReader:
     def __init__(self, data_folder: str):
         # Define file paths
@@ -17,12 +143,15 @@ class CSVDataReader:
         self.episodes = []
         self.authors = set()
         self.categories = set()
+        # Number of categories created so far; every category in the dataset gets a fresh id.
+        self._category_count = 0
 
-    def read_podcasts(self):
-        # Read podcasts from CSV and create Podcast objects
+    def iter_podcasts(self) -> Iterator[Podcast]:
+        # Yield Podcast objects one CSV row at a time, without keeping them in self.podcasts
         with open(self.podcasts_filepath, 'r', encoding='utf-8') as csvfile:
             csvreader = csv.reader(csvfile)
             next(csvreader)
+            author = None
             for row in csvreader:
                 podcast_id, podcast_title, podcast_image, podcast_description, podcast_language, podcast_categories, \
                     podcast_website, podcast_author, podcast_itunes_id = row
@@ -33,51 +162,53 @@ class CSVDataReader:
 
                 if podcast_author:
                     author = Author(podcast_id, podcast_author)
-                    self.authors.add(author)
 
                 # Create Podcast object
                 podcast = Podcast(podcast_id, author, podcast_title, podcast_image, podcast_description,
                                   podcast_website, podcast_itunes_id, podcast_language)
 
-                self.podcasts.append(podcast)
-
                 categories_list = podcast_categories.split("|")
                 for category_name in categories_list:
                     category_name = category_name.strip()
-                    category_id = len(self.categories) + 1  # Unique ID for the category
-                    category = Category(category_id, category_name)
-                    self.categories.add(category)
-                    podcast.add_category(category)
+                    self._category_count += 1  # Unique ID for the category
+                    podcast.add_category(Category(self._category_count, category_name))
 
+                yield podcast
+
+    def iter_episodes(self, workers: int = 1) -> Iterator[Episode]:
+        # Yield Episode objects one CSV row at a time, without keeping them in self.episodes. With more than one
+        # worker, ranges of the file are parsed in worker processes and yielded in file order.
+        if workers > 1:
+            yield from self._iter_episodes_in_parallel(workers)
+            return
 
-    def read_episodes(self):
-        # Read episodes from CSV and create Episode objects
         with open(self.episodes_filepath, 'r', encoding='utf-8') as csvfile:
             csvreader = csv.reader(csvfile)
             next(csvreader)
             for row in csvreader:
-                episode_id, episode_podcast_id, episode_title, episode_audio, \
-                    episode_audio_length, episode_description, episode_pub_date = row
-
-                # Convert values to integer
-                episode_id = int(episode_id) if episode_id else None
-                episode_podcast_id = int(episode_podcast_id) if episode_podcast_id else None
-                episode_audio_length = int(episode_audio_length) if episode_audio_length else None
+                # Create Episode object
+                yield Episode(*_episode_fields(row))
 
-                # Preprocess pub_date to replace '+00' with '+0000'
-                if episode_pub_date.endswith('+00'):
-                    episode_pub_date = episode_pub_date.replace('+00', '+0000')
+    def _iter_episodes_in_parallel(self, workers: int) -> Iterator[Episode]:
+        ranges = _record_ranges(self.episodes_filepath, workers * RANGES_PER_WORKER)
+        starts = [start for start, _ in ranges]
+        ends = [end for _, end in ranges]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for rows in executor.map(_read_episode_range, repeat(self.episodes_filepath), starts, ends):
+                for fields in rows:
+                    yield Episode(*fields)
 
-                # Convert pub_date from string to datetime using strptime
-                try:
-                    episode_pub_date = datetime.strptime(episode_pub_date, '%Y-%m-%d %H:%M:%S%z')
-                except ValueError:
-                    episode_pub_date = datetime.strptime(episode_pub_date, '%Y-%m-%d')
+    def read_podcasts(self):
+        # Read podcasts from CSV and create Podcast objects
+        for podcast in self.iter_podcasts():
+            self.podcasts.append(podcast)
+            if podcast.author is not None:
+                self.authors.add(podcast.author)
+            self.categories.update(podcast.categories)
 
-                # Create Episode object
-                episode = Episode(episode_id, episode_podcast_id, episode_audio_length, episode_title,
-                                  episode_audio, episode_description, episode_pub_date)
-                self.episodes.append(episode)
+    def read_episodes(self, workers: int = 1):
+        # Read episodes from CSV and create Episode objects
+        self.episodes.extend(self.iter_episodes(workers))
 
 '''
 testobject = CSVDataReader()
@@ -0,0 +1,72 @@
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+from podcast.domainmodel.model import Podcast, RatingSummary
+from podcast.adapters.repository import LEADERBOARD_TOP_RATED, LEADERBOARD_MOST_REVIEWED, LEADERBOARDS
+
+# A leaderboard restricted to podcasts in a category or language, e.g. ('category', 'Comedy'); (None, None) is the
+# overall leaderboard.
+Scope = Tuple[Optional[str], Optional[str]]
+OVERALL: Scope = (None, None)
+
+
+def leaderboard_key(leaderboard: str, podcast_id: int, rating: RatingSummary) -> tuple:
+    """ Sort key placing podcasts in leaderboard order: best first, ties broken by review count and then id. """
+    if leaderboard == LEADERBOARD_TOP_RATED:
+        return -(rating.total / rating.count), -rating.count, podcast_id
+    if leaderboard == LEADERBOARD_MOST_REVIEWED:
+        return -rating.count, podcast_id
+    raise ValueError(f"Unknown leaderboard: {leaderboard}")
+
+
+def language_scope(language: str) -> Scope:
+    # Languages are typed in by visitors, so they are matched case-insensitively.
+    return 'language', language.lower()
+
+
+def podcast_scopes(podcast: Podcast) -> List[Scope]:
+    scopes = [OVERALL] + [('category', category.name) for category in podcast.categories]
+    if podcast.language:
+        scopes.append(language_scope(podcast.language))
+    return scopes
+
+
+class PodcastLeaderboards:
+    """ Reviewed podcasts in the order of each leaderboard, overall and within each of their categories and languages.
+
+    A podcast is moved within its orderings, with a binary search, whenever one of its reviews is stored, so reading
+    the top of a leaderboard costs the same however many reviews there are. Heaps bounded to the top entries cannot
+    be used: when a leading podcast's average falls, the podcast that should replace it is not in the heap.
+    """
+
+    def __init__(self):
+        self._orders: Dict[Tuple[str, Scope], List[tuple]] = {}
+        # Scopes each podcast was ranked in and its key on each leaderboard, so it can be found again.
+        self._entries: Dict[int, Tuple[List[Scope], Dict[str, tuple]]] = {}
+
+    def update(self, podcast: Podcast, rating: RatingSummary):
+        self.remove(podcast.id)
+        if not rating.count:
+            return
+        scopes = podcast_scopes(podcast)
+        keys = {leaderboard: leaderboard_key(leaderboard, podcast.id, rating) for leaderboard in LEADERBOARDS}
+        for leaderboard, key in keys.items():
+            for scope in scopes:
+                bisect.insort(self._orders.setdefault((leaderboard, scope), []), key)
+        self._entries[podcast.id] = (scopes, keys)
+
+    def remove(self, podcast_id: int):
+        entry = self._entries.pop(podcast_id, None)
+        if entry is None:
+            return
+        scopes, keys = entry
+        for leaderboard, key in keys.items():
+            for scope in scopes:
+                order = self._orders[(leaderboard, scope)]
+                del order[bisect.bisect_left(order, key)]
+
+    def top(self, leaderboard: str, limit: int, scope: Scope = OVERALL) -> List[int]:
+        """ Returns the ids of the first limit podcasts on the leaderboard within scope. """
+        if leaderboard not in LEADERBOARDS:
+            raise ValueError(f"Unknown leaderboard: {leaderboard}")
+        return [key[-1] for key in self._orders.get((leaderboard, scope), [])[:limit]]
@@ -1,8 +1,19 @@
-from typing import List, Dict
-from podcast.domainmodel.model import Podcast, Episode, Author, Category, Review, Playlist, User
-from podcast.adapters.repository import AbstractRepository
+import bisect
+import secrets
+from collections import OrderedDict
+from typing import Iterable, List, Dict, Optional, Sequence, Tuple
+from podcast.domainmodel.model import Podcast, Episode, Author, Category, Review, Playlist, User, RatingSummary, \
+    normalise_username
+from podcast.adapters.repository import AbstractRepository, Page, PodcastCursor, LeaderboardEntry, podcast_cursor
+from podcast.adapters.leaderboards import PodcastLeaderboards, OVERALL, language_scope
+from podcast.adapters.searchIndex import PodcastSearchIndex
+from podcast.adapters.titleIndex import PodcastTitleOrder, PodcastLetterIndex
+from podcast.adapters.snapshot import load_snapshot, save_snapshot
 from podcast.adapters.datareader.csvdatareader import CSVDataReader
 
+# Number of distinct searches whose ordered results are kept, so that paging through them does not re-sort.
+SEARCH_RESULTS_CACHE_SIZE = 256
+
 class MemoryRepository(AbstractRepository):
 
     def __init__(self):
@@ -11,39 +22,110 @@ class MemoryRepository(AbstractRepository):
         self._authors: Dict[int, Author] = {}
         self._categories: Dict[int, Category] = {}
         self._reviews: Dict[int, Review] = {}
+        self._rating_summaries: Dict[int, RatingSummary] = {}
+        self._leaderboards = PodcastLeaderboards()
         self._playlists: Dict[int, Playlist] = {}
+        # Playlists of each owner, keyed by user id and kept in id order.
+        self._playlists_by_owner: Dict[int, List[Playlist]] = {}
         self._users: Dict[int, User] = {}
+        self._users_by_username: Dict[str, User] = {}
         self._next_user_id = 1
         self._next_playlist_id = 1
         self._next_review_id = 1
+        self._search_index = PodcastSearchIndex()
+        self._search_results: OrderedDict[Tuple[str, str], List[Podcast]] = OrderedDict()
+        self._title_order = PodcastTitleOrder()
+        self._letter_index = PodcastLetterIndex()
+        # Counts writes; see get_change_version. Starting at random keeps a restarted app, or another worker, from
+        # repeating the versions, and so the ETags, of different contents.
+        self._change_version = secrets.randbelow(1 << 31)
 
+    def get_change_version(self) -> int:
+        return self._change_version
 
     # Podcast methods
     def add_podcast(self, podcast: Podcast):
         self._podcasts[podcast.id] = podcast
+        self._search_index.add_podcast(podcast)
+        self._search_results.clear()
+        self._title_order.add_podcast(podcast)
+        self._letter_index.add_podcast(podcast)
+        self._change_version += 1
 
     def get_podcast(self, podcast_id: int) -> Podcast:
         return self._podcasts.get(podcast_id)
 
+    def get_podcast_details(self, podcast_id: int) -> Podcast:
+        return self._podcasts.get(podcast_id)
+
+    def get_podcasts_by_letter(self, letter: str, limit: int, after: PodcastCursor = None) -> Page:
+        podcasts = self._letter_index.podcasts(letter)
+        offset = 0
+        if after is not None:
+            offset = bisect.bisect_right(podcasts, (after[0].lower(), after[1]),
+                                         key=lambda podcast: (podcast.title.lower(), podcast.id))
+        items = list(podcasts[offset:offset + limit])
+        next_cursor = podcast_cursor(items[-1]) if items and offset + limit < len(podcasts) else None
+        return Page(items, len(podcasts), next_cursor)
+
+    def get_podcasts_by_ids(self, podcast_ids: Sequence[int]) -> List[Podcast]:
+        return [self._podcasts[podcast_id] for podcast_id in podcast_ids if podcast_id in self._podcasts]
+
     def get_all_podcasts(self) -> List[Podcast]:
         return list(self._podcasts.values())
 
+    def search_podcasts(self, query: str, field: str, offset: int = 0, limit: int = None) -> List[Podcast]:
+        podcasts = self._ordered_search_results(query, field)
+        return podcasts[offset:None if limit is None else offset + limit]
+
+    def count_search_results(self, query: str, field: str) -> int:
+        return len(self._ordered_search_results(query, field))
+
+    def search_podcasts_page(self, query: str, field: str, limit: int, offset: int = 0,
+                             after: PodcastCursor = None) -> Page:
+        podcasts = self._ordered_search_results(query, field)
+        if after is not None:
+            offset = bisect.bisect_right(podcasts, tuple(after), key=podcast_cursor)
+        items = podcasts[offset:offset + limit]
+        next_cursor = podcast_cursor(items[-1]) if items and offset + limit < len(podcasts) else None
+        return Page(items, len(podcasts), next_cursor)
+
+    def _ordered_search_results(self, query: str, field: str) -> List[Podcast]:
+        key = (field, query.lower())
+        podcasts = self._search_results.get(key)
+        if podcasts is None:
+            podcast_ids = self._search_index.search(query, field)
+            podcasts = sorted((self._podcasts[podcast_id] for podcast_id in podcast_ids), key=podcast_cursor)
+            self._search_results[key] = podcasts
+            if len(self._search_results) > SEARCH_RESULTS_CACHE_SIZE:
+                self._search_results.popitem(last=False)
+        else:
+            self._search_results.move_to_end(key)
+        return podcasts
+
+    def get_previous_and_next_podcast_ids(self, podcast_id: int) -> Tuple[Optional[int], Optional[int]]:
+        return self._title_order.neighbours(podcast_id)
+
     # Episode methods
     def add_episode(self, episode: Episode):
         self._episodes[episode.id] = episode
+        self._change_version += 1
 
     def get_episode(self, episode_id: int) -> Episode:
         return self._episodes.get(episode_id)
 
     def add_episode_to_playlist(self, episode: Episode, playlist: Playlist):
         playlist.add_episode(episode)
+        self._change_version += 1
 
     def remove_episode_from_playlist(self, episode: Episode, playlist: Playlist):
         playlist.remove_episode(episode)
+        self._change_version += 1
 
     # Author methods
     def add_author(self, author: Author):
         self._authors[author.id] = author
+        self._change_version += 1
 
     def get_author(self, author_id: int) -> Author:
         return self._authors.get(author_id)
@@ -51,6 +133,7 @@ class MemoryRepository(AbstractRepository):
     # Category methods
     def add_category(self, category: Category):
         self._categories[category.id] = category
+        self._change_version += 1
 
     def get_category(self, category_id: int) -> Category:
         return self._categories.get(category_id)
@@ -59,8 +142,17 @@ class MemoryRepository(AbstractRepository):
         return list(self._categories.values())
 
     # Review methods
-    def add_review(self, review: Review):
+    def _store_review(self, review: Review):
+        if review.id not in self._reviews:
+            podcast_id = review.podcast.id
+            self._rating_summaries[podcast_id] = self.get_rating_summary(podcast_id).with_rating(review.rating)
+            if podcast_id in self._podcasts:
+                self._leaderboards.update(self._podcasts[podcast_id], self._rating_summaries[podcast_id])
         self._reviews[review.id] = review
+        self._change_version += 1
+
+    def add_review(self, review: Review):
+        self._store_review(review)
         reviewed_item = review.podcast
 
         if isinstance(reviewed_item, Podcast):
@@ -70,8 +162,7 @@ class MemoryRepository(AbstractRepository):
 
     def add_review_to_podcast(self, review: Review, podcast: Podcast):
         podcast.add_review(review)
-        self._reviews[review.id] = review
-
+        self._store_review(review)
 
     def get_next_review_id(self) -> int:
         review_id = self._next_review_id
@@ -85,9 +176,23 @@ class MemoryRepository(AbstractRepository):
         podcast = self.get_podcast(podcast_id)
         return podcast.reviews if podcast else []
 
+    def get_rating_summary(self, podcast_id: int) -> RatingSummary:
+        return self._rating_summaries.get(podcast_id, RatingSummary())
+
+    def get_leaderboard(self, leaderboard: str, limit: int, category: str = None,
+                        language: str = None) -> List[LeaderboardEntry]:
+        scope = ('category', category) if category else language_scope(language) if language else OVERALL
+        return [LeaderboardEntry(self._podcasts[podcast_id], self._rating_summaries[podcast_id])
+                for podcast_id in self._leaderboards.top(leaderboard, limit, scope)]
+
     # Playlist methods
     def add_playlist(self, playlist: Playlist):
+        previous = self._playlists.get(playlist.id)
+        if previous is not None:
+            self._playlists_by_owner[previous.owner.id].remove(previous)
         self._playlists[playlist.id] = playlist
+        bisect.insort(self._playlists_by_owner.setdefault(playlist.owner.id, []), playlist, key=lambda owned: owned.id)
+        self._change_version += 1
 
     def get_playlist(self, playlist_id: int) -> Playlist:
         return self._playlists.get(playlist_id)
@@ -98,11 +203,17 @@ class MemoryRepository(AbstractRepository):
         return playlist_id
 
     def get_playlist_by_user(self, user: User) -> Playlist:
-        return next((playlist for playlist in self._playlists.values() if playlist.owner == user), None)
+        owned = self._playlists_by_owner.get(user.id)
+        return owned[0] if owned else None
+
+    def get_playlists_by_user(self, user: User) -> List[Playlist]:
+        return list(self._playlists_by_owner.get(user.id, ()))
 
     # User methods
     def add_user(self, user: User):
         self._users[user.id] = user
+        self._users_by_username[user.username] = user
+        self._change_version += 1
 
     def get_user(self, user_id: int) -> User:
         return self._users.get(user_id)
@@ -113,31 +224,34 @@ class MemoryRepository(AbstractRepository):
         return user_id
 
     def get_user_by_username(self, username: str) -> User:
-        return next((user for user in self._users.values() if user.username == username), None)
-
-def load_data(self, data_path):
-# Initialize the CSVDataReader
-    csv_reader = CSVDataReader(data_path)
-    csv_reader.read_podcasts()
-    csv_reader.read_episodes()
+        return self._users_by_username.get(normalise_username(username))
 
-    # Add podcasts, authors, and categories to the repository
-    for podcast in csv_reader.podcasts:
+def load_data(self, podcasts: Iterable[Podcast], episodes: Iterable[Episode]):
+    # Add podcasts, authors, and categories to the repository as they are read
+    for podcast in podcasts:
         self.add_podcast(podcast)
-
-    for author in csv_reader.authors:
-        self.add_author(author)
-
-    for category in csv_reader.categories:
-        self.add_category(category)
+        if podcast.author is not None:
+            self.add_author(podcast.author)
+        for category in podcast.categories:
+            self.add_category(category)
     # Add episodes to the repository
-    for episode in csv_reader.episodes:
+    for episode in episodes:
         self.add_episode(episode)
 
-def populate(self,data_path):
-    load_data(self, data_path)
+def link_episodes(self):
     # Link episodes to their respective podcasts:
     for episode in self._episodes.values():
         podcast = self.get_podcast(episode.podcast_id)
         if podcast:
-            podcast.add_episode(episode)
\ No newline at end of file
+            podcast.add_episode(episode)
+
+def populate(self, data_path, snapshot_path=None):
+    # With a snapshot_path, a snapshot of the current CSV files is loaded instead of parsing them, and one is written
+    # after parsing when there is none.
+    if snapshot_path is not None and load_snapshot(self, snapshot_path, data_path):
+        return
+    csv_reader = CSVDataReader(data_path)
+    load_data(self, csv_reader.iter_podcasts(), csv_reader.iter_episodes())
+    link_episodes(self)
+    if snapshot_path is not None:
+        save_snapshot(self, snapshot_path, data_path)
@@ -1,9 +1,15 @@
+from contextlib import contextmanager
+from typing import List
+
 from sqlalchemy import (
-    Table, MetaData, Column, Integer, String, Date, ForeignKey, DateTime
+    Table, MetaData, Column, Integer, String, Date, ForeignKey, DateTime, Index, event, func, inspect, table, column, DDL,
+    bindparam, select, cast, Float, Computed
 )
-from sqlalchemy.orm import relationship, registry
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.orm import Session, attributes, relationship, registry
 
-from podcast.domainmodel.model import Author, Podcast, Category, User, PodcastSubscription, Episode, Review, Playlist
+from podcast.domainmodel.model import Author, Podcast, Category, User, PodcastSubscription, Episode, Review, Playlist, \
+    OrderedSet, RATINGS
 # Create MetaData instance
 metadata = MetaData()
 
@@ -18,14 +24,23 @@ podcasts_table = Table(
     'podcasts', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
     Column('author_id', ForeignKey('authors.id'), nullable=False),
-    Column('title', String(255), nullable=False),
+    Column('title', String(255), nullable=False, index=True),
     Column('image', String(255)),
     Column('description', String),
     Column('website', String(255)),
     Column('itunes_id', Integer),
-    Column('language', String(64))
+    Column('language', String(64)),
+    # Catalogue letter of the title, as catalogue_letter in podcast.adapters.repository works it out.
+    Column('first_letter', String(1), Computed(
+        "CASE WHEN upper(substr(title, 1, 1)) BETWEEN 'A' AND 'Z' THEN upper(substr(title, 1, 1)) ELSE '#' END"))
 )
 
+# Serves previous/next navigation, which orders podcasts by lower-cased title.
+Index('ix_podcasts_title_lower', func.lower(podcasts_table.c.title))
+# Serves the catalogue, which lists the podcasts under one letter in lower-cased title order.
+Index('ix_podcasts_first_letter', podcasts_table.c.first_letter, func.lower(podcasts_table.c.title),
+      podcasts_table.c.id)
+
 categories_table = Table(
     'categories', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
@@ -72,19 +87,273 @@ reviews_table = Table(
     Column('content', String, nullable=False)
 )
 
+# Running totals of each podcast's review ratings, kept up to date by triggers on reviews (see
+# create_podcast_ratings_triggers). Podcasts without reviews have no row.
+podcast_ratings_table = Table(
+    'podcast_ratings', metadata,
+    Column('podcast_id', ForeignKey('podcasts.id'), primary_key=True),
+    Column('review_count', Integer, nullable=False),
+    Column('rating_total', Integer, nullable=False),
+    *[Column(f'rating_{rating}', Integer, nullable=False) for rating in RATINGS]
+)
+
+# Average rating, as it must be written in queries for SQLite to read their order from ix_podcast_ratings_top_rated.
+podcast_average_rating = cast(podcast_ratings_table.c.rating_total, Float) / podcast_ratings_table.c.review_count
+
+# The orders of the leaderboards, so that their first entries are read straight from an index.
+Index('ix_podcast_ratings_top_rated', podcast_average_rating.desc(), podcast_ratings_table.c.review_count.desc(),
+      podcast_ratings_table.c.podcast_id)
+Index('ix_podcast_ratings_most_reviewed', podcast_ratings_table.c.review_count.desc(),
+      podcast_ratings_table.c.podcast_id)
+
+# A single row counting writes to the repository (see AbstractRepository.get_change_version).
+repository_version_table = Table(
+    'repository_version', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('version', Integer, nullable=False)
+)
+
 playlists_table = Table(
     'playlists', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('owner_id', ForeignKey('users.id'), nullable=False),
+    Column('owner_id', ForeignKey('users.id'), nullable=False, index=True),
     Column('name', String(255), nullable=False)
 )
 
 playlist_episodes_table = Table(
     'playlist_episodes', metadata,
     Column('playlist_id', ForeignKey('playlists.id'), primary_key=True),
-    Column('episode_id', ForeignKey('episodes.id'), primary_key=True)
+    Column('episode_id', ForeignKey('episodes.id'), primary_key=True),
+    # Order of the episodes within a playlist, numbered by number_playlist_entries.
+    Column('position', Integer)
+)
+
+# Full-text search over podcasts. This is an SQLite FTS5 virtual table, so it is created with raw DDL rather than
+# through metadata; its rowid is the podcast id. The trigram tokenizer lets MATCH do case-insensitive substring search.
+podcast_search_table = table(
+    'podcast_search',
+    column('rowid'), column('title'), column('author'), column('categories'), column('language')
 )
 
+# Category names are joined with the ASCII unit separator so that a search cannot match across two of them.
+_podcast_search_row = """
+    SELECT podcasts.id, podcasts.title, authors.name,
+           (SELECT group_concat(categories.name, char(31)) FROM podcast_categories
+            JOIN categories ON categories.id = podcast_categories.category_id
+            WHERE podcast_categories.podcast_id = podcasts.id),
+           podcasts.language
+    FROM podcasts LEFT JOIN authors ON authors.id = podcasts.author_id
+"""
+
+_podcast_search_refresh = """
+        DELETE FROM podcast_search WHERE rowid IN ({ids});
+        INSERT INTO podcast_search (rowid, title, author, categories, language)
+        {row} WHERE podcasts.id IN ({ids});
+"""
+
+_podcast_search_triggers = [
+    """CREATE TRIGGER podcast_search_podcast_insert AFTER INSERT ON podcasts BEGIN
+        INSERT INTO podcast_search (rowid, title, author, categories, language)
+        {row} WHERE podcasts.id = new.id;
+    END""".format(row=_podcast_search_row),
+    """CREATE TRIGGER podcast_search_podcast_update AFTER UPDATE OF title, author_id, language ON podcasts BEGIN
+        {refresh}
+    END""".format(refresh=_podcast_search_refresh.format(row=_podcast_search_row, ids='new.id')),
+    """CREATE TRIGGER podcast_search_podcast_delete AFTER DELETE ON podcasts BEGIN
+        DELETE FROM podcast_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER podcast_search_category_link AFTER INSERT ON podcast_categories BEGIN
+        {refresh}
+    END""".format(refresh=_podcast_search_refresh.format(row=_podcast_search_row, ids='new.podcast_id')),
+    """CREATE TRIGGER podcast_search_category_unlink AFTER DELETE ON podcast_categories BEGIN
+        {refresh}
+    END""".format(refresh=_podcast_search_refresh.format(row=_podcast_search_row, ids='old.podcast_id')),
+    """CREATE TRIGGER podcast_search_author_rename AFTER UPDATE OF name ON authors BEGIN
+        {refresh}
+    END""".format(refresh=_podcast_search_refresh.format(
+        row=_podcast_search_row, ids='SELECT id FROM podcasts WHERE author_id = new.id')),
+    """CREATE TRIGGER podcast_search_category_rename AFTER UPDATE OF name ON categories BEGIN
+        {refresh}
+    END""".format(refresh=_podcast_search_refresh.format(
+        row=_podcast_search_row, ids='SELECT podcast_id FROM podcast_categories WHERE category_id = new.id')),
+]
+_podcast_search_trigger_names = [statement.split()[2] for statement in _podcast_search_triggers]
+
+
+def create_podcast_search_table(target, connection, **kw):
+    """ Creates the podcast_search table and the triggers that keep it in sync, indexing any existing podcasts.
+
+    Does nothing on databases other than SQLite, or when the table already exists.
+    """
+    if connection.dialect.name != 'sqlite' or inspect(connection).has_table('podcast_search'):
+        return
+    connection.exec_driver_sql(
+        "CREATE VIRTUAL TABLE podcast_search USING fts5(title, author, categories, language, tokenize='trigram')")
+    for statement in _podcast_search_triggers:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql(
+        'INSERT INTO podcast_search (rowid, title, author, categories, language) ' + _podcast_search_row)
+
+
+@contextmanager
+def podcast_search_rebuilt_after(connection):
+    """ Drops the triggers that keep podcast_search in sync while the block runs, then indexes every podcast again
+    with a single INSERT ... SELECT and puts the triggers back.
+
+    For bulk loads, where the triggers would index each podcast again for every category linked to it. The block must
+    run inside a transaction, so that the triggers come back with a rollback if it fails. Where there is no
+    podcast_search table the block just runs.
+    """
+    if connection.dialect.name != 'sqlite' or not inspect(connection).has_table('podcast_search'):
+        yield
+        return
+    for name in _podcast_search_trigger_names:
+        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+    yield
+    connection.exec_driver_sql('DELETE FROM podcast_search')
+    connection.exec_driver_sql(
+        'INSERT INTO podcast_search (rowid, title, author, categories, language) ' + _podcast_search_row)
+    for statement in _podcast_search_triggers:
+        connection.exec_driver_sql(statement)
+
+
+def drop_podcast_search_table(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('DROP TABLE IF EXISTS podcast_search')
+
+
+event.listen(metadata, 'after_create', create_podcast_search_table)
+event.listen(metadata, 'before_drop', drop_podcast_search_table)
+
+_rating_columns = ', '.join(f'rating_{rating}' for rating in RATINGS)
+
+# Adds the rating of review {row} (new or old) to its podcast's totals.
+_podcast_ratings_add = """
+        INSERT INTO podcast_ratings (podcast_id, review_count, rating_total, {columns})
+        VALUES ({{row}}.podcast_id, 1, {{row}}.rating, {values})
+        ON CONFLICT (podcast_id) DO UPDATE SET review_count = review_count + 1,
+            rating_total = rating_total + excluded.rating_total, {increments};
+""".format(columns=_rating_columns,
+           values=', '.join(f'{{row}}.rating = {rating}' for rating in RATINGS),
+           increments=', '.join(f'rating_{rating} = rating_{rating} + excluded.rating_{rating}' for rating in RATINGS))
+
+_podcast_ratings_subtract = """
+        UPDATE podcast_ratings SET review_count = review_count - 1, rating_total = rating_total - {{row}}.rating,
+            {decrements}
+        WHERE podcast_id = {{row}}.podcast_id;
+""".format(decrements=', '.join(f'rating_{rating} = rating_{rating} - ({{row}}.rating = {rating})'
+                                for rating in RATINGS))
+
+_podcast_ratings_ddl = [
+    """CREATE TRIGGER podcast_ratings_review_insert AFTER INSERT ON reviews BEGIN
+        {add}
+    END""".format(add=_podcast_ratings_add.format(row='new')),
+    """CREATE TRIGGER podcast_ratings_review_delete AFTER DELETE ON reviews BEGIN
+        {subtract}
+    END""".format(subtract=_podcast_ratings_subtract.format(row='old')),
+    """CREATE TRIGGER podcast_ratings_review_update AFTER UPDATE OF podcast_id, rating ON reviews BEGIN
+        {subtract}
+        {add}
+    END""".format(subtract=_podcast_ratings_subtract.format(row='old'), add=_podcast_ratings_add.format(row='new')),
+]
+
+
+def create_podcast_ratings_triggers(target, connection, **kw):
+    """ Creates the triggers that keep podcast_ratings in step with reviews, totalling up any existing reviews.
+
+    Does nothing on databases other than SQLite, or when the triggers already exist.
+    """
+    if connection.dialect.name != 'sqlite' or connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'podcast_ratings_review_insert'").first():
+        return
+    for statement in _podcast_ratings_ddl:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql('DELETE FROM podcast_ratings')
+    connection.exec_driver_sql(
+        f'INSERT INTO podcast_ratings (podcast_id, review_count, rating_total, {_rating_columns}) '
+        f'SELECT podcast_id, count(*), sum(rating), '
+        f'{", ".join(f"sum(rating = {rating})" for rating in RATINGS)} FROM reviews GROUP BY podcast_id')
+
+
+event.listen(metadata, 'after_create', create_podcast_ratings_triggers)
+
+
+def number_playlist_entries(session, flush_context):
+    """ Gives the episodes added to a playlist positions after its last episode, in the order of Playlist.episodes.
+
+    Runs after each flush, once the new playlist_episodes rows exist. The ORM writes those rows in no particular
+    order, so their position cannot be assigned on insert.
+    """
+    for instance in list(session.new) + list(session.dirty):
+        if not isinstance(instance, Playlist):
+            continue
+        added = set(attributes.get_history(instance, '_episodes').added)
+        if not added:
+            continue
+        position = session.connection().execute(
+            select(func.coalesce(func.max(playlist_episodes_table.c.position), -1))
+            .where(playlist_episodes_table.c.playlist_id == instance.id)).scalar()
+        entries = []
+        for episode in instance.episodes:
+            if episode in added:
+                position += 1
+                entries.append({'entry_playlist_id': instance.id, 'entry_episode_id': episode.id,
+                                'position': position})
+        session.connection().execute(
+            playlist_episodes_table.update()
+            .where(playlist_episodes_table.c.playlist_id == bindparam('entry_playlist_id'))
+            .where(playlist_episodes_table.c.episode_id == bindparam('entry_episode_id')), entries)
+
+
+event.listen(Session, 'after_flush', number_playlist_entries)
+
+
+def _add_missing_columns(connection) -> List[Column]:
+    inspector = inspect(connection)
+    added_columns = []
+    for mapped_table in metadata.sorted_tables:
+        if not inspector.has_table(mapped_table.name):
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(mapped_table.name)}
+        for column in mapped_table.columns:
+            if column.name not in existing_columns:
+                connection.execute(DDL('ALTER TABLE %(table)s ADD COLUMN {}'.format(
+                    CreateColumn(column).compile(dialect=connection.dialect))).against(mapped_table))
+                added_columns.append(column)
+    return added_columns
+
+
+def create_missing_schema(connection):
+    """ Brings a database created by an earlier version of the app up to date.
+
+    Creates any missing tables (including podcast_search, and podcast_ratings with its triggers), and adds any columns
+    and indexes that have since been added to existing tables. Existing data is left untouched, apart from filling in
+    new columns and tables derived from it.
+    """
+    added_columns = _add_missing_columns(connection)
+    if playlist_episodes_table.c.position in added_columns and connection.dialect.name == 'sqlite':
+        # Playlists saved before positions were kept are ordered as their entries were inserted.
+        connection.exec_driver_sql('UPDATE playlist_episodes SET position = rowid')
+    metadata.create_all(connection)
+    if connection.dialect.name == 'sqlite':
+        # The inspector does not report expression indexes such as ix_podcasts_title_lower.
+        existing_indexes = set(connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")
+                               .scalars())
+    else:
+        inspector = inspect(connection)
+        existing_indexes = {index['name'] for mapped_table in metadata.sorted_tables
+                            for index in inspector.get_indexes(mapped_table.name)}
+    for mapped_table in metadata.sorted_tables:
+        for index in mapped_table.indexes:
+            if index.name not in existing_indexes:
+                index.create(connection)
+
+
+class MappedOrderedSet(OrderedSet):
+    """ Collection class of the OrderedSet relationships. The ORM instruments the methods of its collection classes in
+    place, so it does that to this subclass, leaving OrderedSet as it is for unmapped objects.
+    """
+
 
 # Create a registry instance
 mapper_registry = registry()
@@ -96,18 +365,20 @@ def map_model_to_tables():
         'podcast_list': relationship(Podcast, back_populates='_author')
     })
 
-    mapper_registry.map_imperatively(Podcast, podcasts_table, properties={
+    mapper_registry.map_imperatively(Podcast, podcasts_table, exclude_properties=['first_letter'], properties={
         '_id': podcasts_table.c.id,
-        '_author': relationship(Author, back_populates='podcast_list'),
+        # Every page showing a podcast shows its author, and a review its user, so these are loaded with a join.
+        '_author': relationship(Author, back_populates='podcast_list', lazy='joined'),
         '_title': podcasts_table.c.title,
         '_image': podcasts_table.c.image,
         '_description': podcasts_table.c.description,
         '_website': podcasts_table.c.website,
         '_itunes_id': podcasts_table.c.itunes_id,
         '_language': podcasts_table.c.language,
-        'categories': relationship(Category, secondary=podcast_categories_table, back_populates='podcasts'),
-        'episodes': relationship(Episode, back_populates='_podcast'),
-        'reviews': relationship(Review, back_populates='_podcast')
+        'categories': relationship(Category, secondary=podcast_categories_table, back_populates='podcasts',
+                                   collection_class=MappedOrderedSet),
+        'episodes': relationship(Episode, back_populates='_podcast', collection_class=MappedOrderedSet),
+        'reviews': relationship(Review, back_populates='_podcast', collection_class=MappedOrderedSet)
     })
 
     mapper_registry.map_imperatively(Category, categories_table, properties={
@@ -145,7 +416,7 @@ def map_model_to_tables():
     mapper_registry.map_imperatively(Review, reviews_table, properties={
         '_id': reviews_table.c.id,
         '_podcast': relationship(Podcast, back_populates='reviews'),
-        '_user': relationship(User),
+        '_user': relationship(User, lazy='joined'),
         '_rating': reviews_table.c.rating,
         '_content': reviews_table.c.content
     })
@@ -154,6 +425,7 @@ def map_model_to_tables():
         '_id': playlists_table.c.id,
         '_owner': relationship(User, back_populates='_playlists'),
         '_name': playlists_table.c.name,
-        '_episodes': relationship(Episode, secondary=playlist_episodes_table, back_populates='playlists')
+        '_episodes': relationship(Episode, secondary=playlist_episodes_table, back_populates='playlists',
+                                  collection_class=MappedOrderedSet, order_by=playlist_episodes_table.c.position)
     })
 
@@ -1,7 +1,54 @@
 import abc
-from typing import List
+from typing import List, NamedTuple, Optional, Sequence, Tuple
 
-from podcast.domainmodel.model import Podcast, Episode, Author, Category, Review, Playlist, User
+from podcast.domainmodel.model import Podcast, Episode, Author, Category, Review, Playlist, User, RatingSummary
+
+# Fields that podcasts can be searched by.
+SEARCH_TITLE = 'title'
+SEARCH_AUTHOR = 'author'
+SEARCH_CATEGORY = 'category'
+SEARCH_LANGUAGE = 'language'
+SEARCH_FIELDS = (SEARCH_TITLE, SEARCH_AUTHOR, SEARCH_CATEGORY, SEARCH_LANGUAGE)
+
+# Catalogue letter of podcasts whose title does not start with an ASCII letter.
+CATALOGUE_OTHER = '#'
+
+
+def catalogue_letter(title: str) -> str:
+    """ Returns the letter, A to Z or CATALOGUE_OTHER, under which the podcast titled title is listed. """
+    # Only ASCII letters are upper-cased, as SQLite's upper() does for podcasts.first_letter.
+    first = title[:1]
+    if first.isascii():
+        first = first.upper()
+    return first if 'A' <= first <= 'Z' else CATALOGUE_OTHER
+
+
+# Leaderboards that podcasts can be ranked on.
+LEADERBOARD_TOP_RATED = 'top-rated'
+LEADERBOARD_MOST_REVIEWED = 'most-reviewed'
+LEADERBOARDS = (LEADERBOARD_TOP_RATED, LEADERBOARD_MOST_REVIEWED)
+
+# Keyset cursor identifying a podcast's position in title order: its (title, id).
+PodcastCursor = Tuple[str, int]
+
+
+class Page(NamedTuple):
+    """ One page of an ordered query result. """
+    items: list
+    # Number of results across all pages.
+    total: int
+    # Cursor of the last item, or None if this is the last page.
+    next_cursor: Optional[PodcastCursor]
+
+
+class LeaderboardEntry(NamedTuple):
+    """ A podcast's place on a leaderboard. """
+    podcast: Podcast
+    rating: RatingSummary
+
+
+def podcast_cursor(podcast: Podcast) -> PodcastCursor:
+    return podcast.title, podcast.id
 
 class RepositoryException(Exception):
     def __init__(self, message=None):
@@ -9,7 +56,15 @@ class RepositoryException(Exception):
 
 
 class AbstractRepository(abc.ABC):
-    
+
+    @abc.abstractmethod
+    def get_change_version(self) -> int:
+        """ Returns a number that changes whenever something is added to, or removed from, the repository.
+
+        Anything derived only from the repository's contents can be reused for as long as this number is unchanged.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_podcast(self, podcast: Podcast):
         """ Adds a Podcast to the repository. """
@@ -23,11 +78,64 @@ class AbstractRepository(abc.ABC):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_podcasts_by_letter(self, letter: str, limit: int, after: PodcastCursor = None) -> Page:
+        """ Returns a page of at most limit of the podcasts listed under letter in the catalogue (see
+        catalogue_letter), ordered by lower-cased title and then id.
+
+        If after is given the page starts with the first podcast following that cursor in this order.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_podcast_details(self, podcast_id: int) -> Podcast:
+        """ Returns the Podcast with the given id, with everything its description page shows loaded: its author,
+        categories, episodes, and reviews together with their users.
+
+        If no Podcast with the given id exists, this method returns None.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_podcasts_by_ids(self, podcast_ids: Sequence[int]) -> List[Podcast]:
+        """ Returns the Podcasts with the given ids, in the order of podcast_ids. Unknown ids are left out. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_all_podcasts(self) -> List[Podcast]:
         """ Returns a list of all Podcasts in the repository. """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def search_podcasts(self, query: str, field: str, offset: int = 0, limit: int = None) -> List[Podcast]:
+        """ Returns the Podcasts whose field (one of SEARCH_FIELDS) contains query, ignoring case.
+
+        The Podcasts are ordered by title. The first offset matches are skipped and at most limit are returned.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def count_search_results(self, query: str, field: str) -> int:
+        """ Returns the number of Podcasts that search_podcasts would return without an offset or limit. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def search_podcasts_page(self, query: str, field: str, limit: int, offset: int = 0,
+                             after: PodcastCursor = None) -> Page:
+        """ Returns one page of the results of search_podcasts, with the total number of results.
+
+        If after is given the page starts with the first result following that cursor and offset is ignored.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_previous_and_next_podcast_ids(self, podcast_id: int) -> Tuple[Optional[int], Optional[int]]:
+        """ Returns the ids of the Podcasts either side of the given one when ordered by lower-cased title.
+
+        Either id is None at the ends of the order, and both are None if no Podcast with the given id exists.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_episode(self, episode: Episode):
         """ Adds an Episode to the repository. """
@@ -89,6 +197,25 @@ class AbstractRepository(abc.ABC):
     def get_next_review_id(self) -> int:
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_rating_summary(self, podcast_id: int) -> RatingSummary:
+        """ Returns the number, total and distribution of the ratings of the given Podcast's reviews.
+
+        These are kept up to date as reviews are added, so this does not read the reviews themselves.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_leaderboard(self, leaderboard: str, limit: int, category: str = None,
+                        language: str = None) -> List[LeaderboardEntry]:
+        """ Returns the first limit reviewed podcasts on the given leaderboard (one of LEADERBOARDS), optionally only
+        those in the named category or else the given language, which is compared case-insensitively.
+
+        Top rated podcasts are ordered by average rating, most reviewed ones by number of reviews; ties go to the
+        podcast with more reviews and then the lower id. Raises ValueError for an unknown leaderboard.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_playlist(self, playlist: Playlist):
         """ Adds a Playlist to the repository. """
@@ -133,6 +260,15 @@ class AbstractRepository(abc.ABC):
 
     @abc.abstractmethod
     def get_playlist_by_user(self, user: User) -> Playlist:
+        """ Returns the first Playlist (by id) owned by the given User.
+
+        If the User has no Playlists, this method returns None.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_playlists_by_user(self, user: User) -> List[Playlist]:
+        """ Returns the Playlists owned by the given User, ordered by id. """
         raise NotImplementedError
 
     @abc.abstractmethod
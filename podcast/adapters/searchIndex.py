@@ -0,0 +1,101 @@
+from typing import Dict, List, Set, Tuple
+
+from podcast.domainmodel.model import Podcast
+from podcast.adapters.repository import SEARCH_TITLE, SEARCH_AUTHOR, SEARCH_CATEGORY, SEARCH_LANGUAGE, SEARCH_FIELDS
+
+# Longest gram stored in the index. Queries up to this length are answered with a single dictionary lookup,
+# longer queries intersect the postings of their grams and then confirm the match with a substring test.
+GRAM_SIZE = 3
+
+
+def _grams(text: str, size: int) -> Set[str]:
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def _all_grams(text: str) -> Set[str]:
+    grams = set()
+    for size in range(1, GRAM_SIZE + 1):
+        grams |= _grams(text, size)
+    return grams
+
+
+class _FieldIndex:
+    """ Case-insensitive substring index over the distinct values of one podcast field.
+
+    Many podcasts share the same value (language, category, often author), so grams point at distinct values and
+    each value keeps the set of podcast ids it belongs to.
+    """
+
+    def __init__(self):
+        self._podcast_ids: Dict[str, Set[int]] = {}
+        self._grams: Dict[str, Set[str]] = {}
+
+    def add(self, value: str, podcast_id: int):
+        ids = self._podcast_ids.get(value)
+        if ids is None:
+            ids = self._podcast_ids[value] = set()
+            for gram in _all_grams(value):
+                self._grams.setdefault(gram, set()).add(value)
+        ids.add(podcast_id)
+
+    def discard(self, value: str, podcast_id: int):
+        ids = self._podcast_ids.get(value)
+        if ids is None:
+            return
+        ids.discard(podcast_id)
+        if not ids:
+            del self._podcast_ids[value]
+            for gram in _all_grams(value):
+                values = self._grams[gram]
+                values.discard(value)
+                if not values:
+                    del self._grams[gram]
+
+    def lookup(self, query: str) -> Set[int]:
+        if not query:
+            values = self._podcast_ids.keys()
+        elif len(query) <= GRAM_SIZE:
+            values = self._grams.get(query, ())
+        else:
+            postings = sorted((self._grams.get(gram, set()) for gram in _grams(query, GRAM_SIZE)), key=len)
+            values = [value for value in postings[0].intersection(*postings[1:]) if query in value]
+
+        podcast_ids = set()
+        for value in values:
+            podcast_ids |= self._podcast_ids[value]
+        return podcast_ids
+
+
+class PodcastSearchIndex:
+    """ In-process inverted index answering the title/author/category/language searches of MemoryRepository. """
+
+    def __init__(self):
+        self._fields: Dict[str, _FieldIndex] = {field: _FieldIndex() for field in SEARCH_FIELDS}
+        # Values each podcast was indexed under, so that it can be removed even after it has been modified.
+        self._indexed: Dict[int, List[Tuple[str, str]]] = {}
+
+    def add_podcast(self, podcast: Podcast):
+        self.remove_podcast(podcast.id)
+        entries = _field_values(podcast)
+        for field, value in entries:
+            self._fields[field].add(value, podcast.id)
+        self._indexed[podcast.id] = entries
+
+    def remove_podcast(self, podcast_id: int):
+        for field, value in self._indexed.pop(podcast_id, []):
+            self._fields[field].discard(value, podcast_id)
+
+    def search(self, query: str, field: str) -> Set[int]:
+        if field not in self._fields:
+            raise ValueError(f"Unknown search field: {field}")
+        return self._fields[field].lookup(query.lower())
+
+
+def _field_values(podcast: Podcast) -> List[Tuple[str, str]]:
+    entries = [(SEARCH_TITLE, podcast.title.lower())]
+    if podcast.author is not None:
+        entries.append((SEARCH_AUTHOR, podcast.author.name.lower()))
+    entries.extend((SEARCH_CATEGORY, category.name.lower()) for category in podcast.categories)
+    if podcast.language is not None:
+        entries.append((SEARCH_LANGUAGE, podcast.language.lower()))
+    return entries
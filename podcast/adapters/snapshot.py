@@ -0,0 +1,89 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import Dict
+
+# Bump whenever the domain model or MemoryRepository changes shape, so that older snapshots are ignored.
+SNAPSHOT_FORMAT_VERSION = 12
+
+SOURCE_FILES = ('podcasts.csv', 'episodes.csv')
+
+# MemoryRepository state that belongs to the process rather than the dataset, so it is not shared through snapshots.
+_PROCESS_STATE = ('_change_version',)
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_fingerprints(data_path) -> Dict[str, dict]:
+    fingerprints = {}
+    for name in SOURCE_FILES:
+        path = os.path.join(data_path, name)
+        stat = os.stat(path)
+        fingerprints[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': _file_hash(path)}
+    return fingerprints
+
+
+def dataset_fingerprint(data_path) -> str:
+    """ Hashes the contents of the CSV files in data_path, so it is the same for every worker reading the same files. """
+    digest = hashlib.sha256()
+    for name in SOURCE_FILES:
+        digest.update(_file_hash(os.path.join(data_path, name)).encode())
+    return digest.hexdigest()
+
+
+def _is_current(stored: Dict[str, dict], data_path) -> bool:
+    # Size and mtime are checked first; the hash is only computed when the mtime alone has moved, e.g. after a fresh
+    # checkout of unchanged files.
+    for name in SOURCE_FILES:
+        fingerprint = stored.get(name)
+        stat = os.stat(os.path.join(data_path, name))
+        if fingerprint is None or fingerprint['size'] != stat.st_size:
+            return False
+        if fingerprint['mtime_ns'] != stat.st_mtime_ns and \
+                fingerprint['sha256'] != _file_hash(os.path.join(data_path, name)):
+            return False
+    return True
+
+
+def load_snapshot(repo, snapshot_path, data_path) -> bool:
+    """ Fills an empty MemoryRepository from the snapshot at snapshot_path.
+
+    Returns False, leaving repo untouched, if there is no snapshot or it was not taken from the current CSV files in
+    data_path by this snapshot format. Snapshots are pickles, so snapshot_path must only be writable by the app.
+    """
+    try:
+        with open(snapshot_path, 'rb') as file:
+            header = pickle.load(file)
+            if header.get('version') != SNAPSHOT_FORMAT_VERSION or not _is_current(header['sources'], data_path):
+                return False
+            state = pickle.load(file)
+    except Exception:
+        # A missing, truncated or incompatible snapshot is rebuilt from the CSV files.
+        return False
+    repo.__dict__.update(state)
+    return True
+
+
+def save_snapshot(repo, snapshot_path, data_path):
+    """ Writes the state of a populated MemoryRepository to snapshot_path, keyed by the CSV files in data_path. """
+    header = {'version': SNAPSHOT_FORMAT_VERSION, 'sources': _source_fingerprints(data_path)}
+    directory = os.path.dirname(os.path.abspath(snapshot_path))
+    os.makedirs(directory, exist_ok=True)
+    # Write to a temporary file and rename it into place, so concurrently starting workers never see a partial file.
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'wb') as file:
+            pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+            state = {name: value for name, value in repo.__dict__.items() if name not in _PROCESS_STATE}
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, snapshot_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
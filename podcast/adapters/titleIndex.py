@@ -0,0 +1,76 @@
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+from podcast.domainmodel.model import Podcast
+from podcast.adapters.repository import catalogue_letter
+
+
+class PodcastTitleOrder:
+    """ Podcast ids ordered by lower-cased title, ties broken by id, for previous/next navigation.
+
+    Inserts and removals keep the ordered list up to date with a binary search. The id to position map is rebuilt
+    on the first lookup after a change, so a run of inserts (such as populating the repository) costs one rebuild.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, int]] = []
+        self._key_by_id: Dict[int, Tuple[str, int]] = {}
+        self._positions: Optional[Dict[int, int]] = {}
+
+    def add_podcast(self, podcast: Podcast):
+        self.remove_podcast(podcast.id)
+        key = (podcast.title.lower(), podcast.id)
+        bisect.insort(self._keys, key)
+        self._key_by_id[podcast.id] = key
+        self._positions = None
+
+    def remove_podcast(self, podcast_id: int):
+        key = self._key_by_id.pop(podcast_id, None)
+        if key is not None:
+            del self._keys[bisect.bisect_left(self._keys, key)]
+            self._positions = None
+
+    def neighbours(self, podcast_id: int) -> Tuple[Optional[int], Optional[int]]:
+        if self._positions is None:
+            self._positions = {key[1]: position for position, key in enumerate(self._keys)}
+
+        position = self._positions.get(podcast_id)
+        if position is None:
+            return None, None
+        previous_id = self._keys[position - 1][1] if position > 0 else None
+        next_id = self._keys[position + 1][1] if position + 1 < len(self._keys) else None
+        return previous_id, next_id
+
+
+class PodcastLetterIndex:
+    """ Podcasts grouped by catalogue letter, each group read in (lower-cased title, id) order.
+
+    A group is sorted into a tuple on its first read after a change, and that tuple is returned until the group next
+    changes. Adding or retitling a podcast only invalidates the groups it leaves and joins.
+    """
+
+    def __init__(self):
+        self._groups: Dict[str, Dict[int, Podcast]] = {}
+        self._letter_by_id: Dict[int, str] = {}
+        self._sorted: Dict[str, Tuple[Podcast, ...]] = {}
+
+    def add_podcast(self, podcast: Podcast):
+        self.remove_podcast(podcast.id)
+        letter = catalogue_letter(podcast.title)
+        self._groups.setdefault(letter, {})[podcast.id] = podcast
+        self._letter_by_id[podcast.id] = letter
+        self._sorted.pop(letter, None)
+
+    def remove_podcast(self, podcast_id: int):
+        letter = self._letter_by_id.pop(podcast_id, None)
+        if letter is not None:
+            del self._groups[letter][podcast_id]
+            self._sorted.pop(letter, None)
+
+    def podcasts(self, letter: str) -> Tuple[Podcast, ...]:
+        podcasts = self._sorted.get(letter)
+        if podcasts is None:
+            podcasts = tuple(sorted(self._groups.get(letter, {}).values(),
+                                    key=lambda podcast: (podcast.title.lower(), podcast.id)))
+            self._sorted[letter] = podcasts
+        return podcasts
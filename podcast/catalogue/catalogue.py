@@ -9,12 +9,20 @@ def create_catalogue_blueprint(repo):
     def show_podcasts():
         current_letter = request.args.get('letter', 'A').upper()
 
-        # Fetch all podcasts starting with the specified letter
-        podcast_data = services.get_podcasts_by_letter(current_letter, repo=repo)
+        # The page continues after the podcast with this title and id; the first page has neither.
+        after_title = request.args.get('after_title')
+        after_id = request.args.get('after_id', type=int)
+        after = (after_title, after_id) if after_title is not None and after_id is not None else None
+
+        # Fetch a page of the podcasts starting with the specified letter
+        podcast_data = services.get_podcasts_by_letter(current_letter, repo=repo, after=after)
 
         return render_template(
             'catalogue.html',
             podcasts=podcast_data['podcasts'],
+            number_of_podcasts=podcast_data['number_of_podcasts'],
+            next_cursor=podcast_data['next_cursor'],
+            is_first_page=after is None,
             current_letter=current_letter,
             letters=list(string.ascii_uppercase) + ['#']
         )
@@ -1,37 +1,18 @@
-from typing import List, Dict
-from podcast.adapters.repository import AbstractRepository
-from podcast.domainmodel.model import Podcast, Episode, Author, Category, Review, Playlist, User
-from podcast.exceptions import NonExistentEpisodeException, NonExistentPodcastException, UnknownUserException
+from typing import Dict
+from podcast.adapters.repository import AbstractRepository, PodcastCursor
+from podcast.serialisation import podcast_summaries
 
-def get_podcasts_by_letter(letter: str, repo: AbstractRepository) -> Dict:
-    letter = letter.upper()
+# Number of podcasts shown on each page of the catalogue.
+CATALOGUE_PAGE_SIZE = 50
 
-    podcasts = repo.get_all_podcasts()
 
-    if letter == '#':
-        filtered_podcasts = [podcast for podcast in podcasts if not podcast.title[0].upper().isalpha()]
-    else:
-        filtered_podcasts = [podcast for podcast in podcasts if podcast.title.upper().startswith(letter)]
+def get_podcasts_by_letter(letter: str, repo: AbstractRepository, after: PodcastCursor = None) -> Dict:
+    letter = letter.upper()
 
-    sorted_podcasts = sorted(filtered_podcasts, key=lambda podcast: podcast.title.upper())
+    page = repo.get_podcasts_by_letter(letter, CATALOGUE_PAGE_SIZE, after)
 
     return {
-        'podcasts': [podcast_to_dict(podcast) for podcast in sorted_podcasts],
+        'podcasts': podcast_summaries(page.items),
+        'number_of_podcasts': page.total,
+        'next_cursor': page.next_cursor,
     }
-
-# Convert model entities to dictionaries
-def podcast_to_dict(podcast: Podcast) -> Dict:
-    return {
-        'id': podcast.id,
-        'title': podcast.title,
-        'author': podcast.author.name,
-        'image': podcast.image,
-        'description': podcast.description,
-        'website': podcast.website,
-        'itunes_id': podcast.itunes_id,
-        'language': podcast.language,
-    }
-
-
-def podcasts_to_dict(podcasts: List[Podcast]) -> List[Dict]:
-    return [podcast_to_dict(podcast) for podcast in podcasts]
\ No newline at end of file
@@ -15,9 +15,6 @@ def create_podcast_description_blueprint(repo: AbstractRepository):
         podcast_data = services.get_podcast_data(podcast_id, repo)
         nav_ids = services.get_previous_and_next_podcast_ids(podcast_id, repo)
 
-        podcast = repo.get_podcast(podcast_id)
-
-
         user_name = session.get('user_name', None)
         user_playlist = False
         if user_name:
@@ -1,29 +1,19 @@
 from typing import Dict
 from podcast.adapters.repository import AbstractRepository
-from podcast.domainmodel.model import Podcast, Review, User, Episode, Playlist
+from podcast.domainmodel.model import Podcast, Review, User, Episode, Playlist, RatingSummary
 from podcast.exceptions import NonExistentEpisodeException, NonExistentPodcastException, UnknownUserException
+from podcast.serialisation import podcast_detail
 
 
 def get_podcast_data(podcast_id: int, repo: AbstractRepository) -> Dict:
-    podcast = repo.get_podcast(podcast_id)
+    podcast = repo.get_podcast_details(podcast_id)
     if podcast is None:
         raise NonExistentPodcastException(f"Podcast with id {podcast_id} does not exist.")
-    return podcast_to_dict(podcast)
+    return podcast_to_dict(podcast, repo.get_rating_summary(podcast_id))
 
 
 def get_previous_and_next_podcast_ids(podcast_id: int, repo: AbstractRepository) -> Dict[str, int]:
-    podcasts = repo.get_all_podcasts()
-    sorted_podcasts = sorted(podcasts, key=lambda podcast: podcast.title.lower())
-
-    previous_id = None
-    next_id = None
-    for index, podcast in enumerate(sorted_podcasts):
-        if podcast.id == podcast_id:
-            if index > 0:
-                previous_id = sorted_podcasts[index - 1].id
-            if index < len(sorted_podcasts) - 1:
-                next_id = sorted_podcasts[index + 1].id
-            break
+    previous_id, next_id = repo.get_previous_and_next_podcast_ids(podcast_id)
 
     return {
         'previous_id': previous_id,
@@ -73,19 +63,11 @@ def calculate_average_rating(podcast: Podcast) -> float:
     return round(average_rating, 1)  # Round to one decimal place
 
 
-def podcast_to_dict(podcast: Podcast) -> Dict:
+def podcast_to_dict(podcast: Podcast, rating_summary: RatingSummary = None) -> Dict:
+    # Without the repository's running totals, the average is worked out from the reviews.
+    average_rating = rating_summary.average if rating_summary is not None else calculate_average_rating(podcast)
     return {
-        'id': podcast.id,
-        'title': podcast.title,
-        'author': podcast.author.name,
-        'image': podcast.image,
-        'description': podcast.description,
-        'website': podcast.website,
-        'itunes_id': podcast.itunes_id,
-        'language': podcast.language,
-        'categories': [category.name for category in podcast.categories],
-        'episodes': sorted(podcast.episodes, key=lambda episode: episode.title),
+        **podcast_detail(podcast),
         'reviews': sorted(podcast.reviews, key=lambda review: review.rating),
-        'average_rating': calculate_average_rating(podcast)  # Add average rating here
+        'average_rating': average_rating
     }
-
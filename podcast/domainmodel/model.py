@@ -1,5 +1,7 @@
 from __future__ import annotations
+from collections.abc import MutableSet
 from datetime import date, datetime
+from typing import NamedTuple, Optional, Tuple
 
 from sqlalchemy import Date
 
@@ -14,6 +16,72 @@ def validate_non_empty_string(value, field_name="value"):
         raise ValueError(f"{field_name} must be a non-empty string.")
 
 
+def normalise_username(username: str) -> str:
+    # The form in which usernames are stored, and so compared when looking a user up.
+    return username.strip()
+
+
+class OrderedSet(MutableSet):
+    """ Set that keeps insertion order, for collections that must not hold duplicates.
+
+    Membership, adding and removing take constant time. Iteration follows insertion order and items can be read by
+    position like a list; the positional view is rebuilt on the first index after a change.
+    """
+    # Treated by the ORM as a set-like collection.
+    __emulates__ = set
+
+    def __init__(self, items=()):
+        self._items = dict.fromkeys(items)
+        self._sequence = None
+
+    def __contains__(self, item) -> bool:
+        return item in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __reversed__(self):
+        return reversed(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if self._sequence is None:
+            self._sequence = list(self._items)
+        return self._sequence[index]
+
+    # add, discard, remove and pop do not call one another, so that the ORM sees each change once.
+    def add(self, item):
+        if item not in self._items:
+            self._items[item] = None
+            self._sequence = None
+
+    def append(self, item):
+        self.add(item)
+
+    def discard(self, item):
+        if item in self._items:
+            del self._items[item]
+            self._sequence = None
+
+    def remove(self, item):
+        del self._items[item]
+        self._sequence = None
+
+    def pop(self):
+        item, _ = self._items.popitem()
+        self._sequence = None
+        return item
+
+    def clear(self):
+        self._items.clear()
+        self._sequence = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self._items)!r})"
+
+
 class Author:
     def __init__(self, author_id: int, name: str):
         validate_non_negative_int(author_id)
@@ -75,14 +143,27 @@ class Podcast:
         self._language = language
         self._website = website
         self._itunes_id = itunes_id
-        self.categories = []
-        self.episodes = []
-        self.reviews = []
+        self.categories = OrderedSet()
+        self.episodes = OrderedSet()
+        self.reviews = OrderedSet()
+        self._version = 0
 
     @property
     def id(self) -> int:
         return self._id
 
+    @property
+    def version(self) -> Optional[int]:
+        """ Counts changes to the podcast's details, categories and episodes, but not to its reviews.
+
+        Podcasts loaded by the ORM are not initialised, so their changes are not counted and this is None.
+        """
+        return getattr(self, '_version', None)
+
+    def _changed(self):
+        if self.version is not None:
+            self._version += 1
+
     @property
     def author(self) -> Author:
         return self._author
@@ -99,6 +180,7 @@ class Podcast:
     def title(self, new_title: str):
         validate_non_empty_string(new_title, "Podcast title")
         self._title = new_title.strip()
+        self._changed()
 
     @property
     def image(self) -> str:
@@ -109,6 +191,7 @@ class Podcast:
         if new_image is not None and not isinstance(new_image, str):
             raise TypeError("Podcast image must be a string or None.")
         self._image = new_image
+        self._changed()
 
     @property
     def description(self) -> str:
@@ -119,6 +202,7 @@ class Podcast:
         if not isinstance(new_description, str):
             validate_non_empty_string(new_description, "Podcast description")
         self._description = new_description
+        self._changed()
 
     @property
     def language(self) -> str:
@@ -129,6 +213,7 @@ class Podcast:
         if not isinstance(new_language, str):
             raise TypeError("Podcast language must be a string.")
         self._language = new_language
+        self._changed()
 
     @property
     def website(self) -> str:
@@ -138,36 +223,35 @@ class Podcast:
     def website(self, new_website: str):
         validate_non_empty_string(new_website, "Podcast website")
         self._website = new_website
+        self._changed()
 
     def add_category(self, category: Category):
         if not isinstance(category, Category):
             raise TypeError("Expected a Category instance.")
-        if category not in self.categories:
-            self.categories.append(category)
+        self.categories.add(category)
+        self._changed()
 
     def remove_category(self, category: Category):
-        if category in self.categories:
-            self.categories.remove(category)
+        self.categories.discard(category)
+        self._changed()
 
     def add_episode(self, episode: Episode):
         if not isinstance(episode, Episode):
             raise TypeError("Expected an Episode instance.")
-        if episode not in self.episodes:
-            self.episodes.append(episode)
+        self.episodes.add(episode)
+        self._changed()
 
     def remove_episode(self, episode: Episode):
-        if episode in self.episodes:
-            self.episodes.remove(episode)
+        self.episodes.discard(episode)
+        self._changed()
 
     def add_review(self, review: Review):
         if not isinstance(review, Review):
             raise TypeError("Expected a Review instance.")
-        if review not in self.reviews:
-            self.reviews.append(review)
+        self.reviews.add(review)
 
     def remove_review(self, review: Review):
-        if review in self.reviews:
-            self.reviews.remove(review)
+        self.reviews.discard(review)
 
     def __repr__(self):
         return f"<Podcast {self.id}: '{self.title}' by {self.author.name}>"
@@ -229,7 +313,7 @@ class User:
         validate_non_empty_string(username, "Username")
         validate_non_empty_string(password, "Password")
         self._id = id
-        self._username = username.strip()
+        self._username = normalise_username(username)
         self._password = password
         self._subscription_list = []
 
@@ -504,6 +588,26 @@ class Review:
         return hash(self._id)
 
 
+# Ratings a review can give.
+RATINGS = range(1, 6)
+
+
+class RatingSummary(NamedTuple):
+    """ Number, total and distribution of the ratings given by a podcast's reviews. """
+    count: int = 0
+    total: int = 0
+    # Number of reviews giving each rating, from 1 to 5.
+    histogram: Tuple[int, ...] = (0,) * len(RATINGS)
+
+    @property
+    def average(self) -> float:
+        return round(self.total / self.count, 1) if self.count else 0.0
+
+    def with_rating(self, rating: int) -> RatingSummary:
+        histogram = tuple(count + (value == rating) for value, count in zip(RATINGS, self.histogram))
+        return RatingSummary(self.count + 1, self.total + rating, histogram)
+
+
 class Playlist:
     def __init__(self, playlist_id: int, owner: User, name: str, episodes: list[Episode] = None):
         validate_non_negative_int(playlist_id)
@@ -512,7 +616,7 @@ class Playlist:
         self._id = playlist_id
         self._owner = owner
         self._name = name.strip()
-        self._episodes = episodes if episodes else []
+        self._episodes = OrderedSet(episodes or ())
 
     @property
     def id(self) -> int:
@@ -532,18 +636,16 @@ class Playlist:
         self._name = new_name.strip()
 
     @property
-    def episodes(self) -> list[Episode]:
+    def episodes(self) -> OrderedSet:
         return self._episodes
 
     def add_episode(self, episode: Episode):
         if not isinstance(episode, Episode):
             raise TypeError("expected episode instance.")
-        if episode not in self._episodes:
-            self._episodes.append(episode)
+        self._episodes.add(episode)
 
     def remove_episode(self, episode: Episode):
-        if episode in self._episodes:
-            self._episodes.remove(episode)
+        self._episodes.discard(episode)
 
     def __repr__(self):
         return (f"Playlist(id={self._id}, owner={self._owner.username}, name='{self._name}', "
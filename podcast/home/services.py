@@ -1,24 +1,69 @@
-from typing import List, Dict
-from podcast.adapters.repository import AbstractRepository
-from podcast.domainmodel.model import Podcast
+import time
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+from podcast.adapters.repository import AbstractRepository, LEADERBOARDS
+from podcast.serialisation import podcast_summaries
 
-def get_homepage_podcasts(repo: AbstractRepository) -> Dict:
-   podcasts = repo.get_all_podcasts()
-   return {
-       'podcasts': [podcast_to_dict(podcast) for podcast in podcasts if podcast.id <= 10]
-   }
+# Where the featured podcasts come from: a fixed list of ids, or the top of one of the LEADERBOARDS.
+FEATURED_BY_ID = 'ids'
+FEATURED_SOURCES = (FEATURED_BY_ID,) + LEADERBOARDS
+
+DEFAULT_FEATURED_PODCAST_IDS = tuple(range(1, 11))
+
+
+class FeaturedPodcasts:
+    """ The podcasts shown on the home page, as summaries, fetched by id or by leaderboard.
+
+    They are kept until the repository's change version moves, so a review posted through any worker is seen by all of
+    them, and for at most ttl seconds. A leaderboard only lists reviewed podcasts, so until it has size of them the
+    rest are taken from podcast_ids.
+    """
+
+    def __init__(self, repo: AbstractRepository, source: str = FEATURED_BY_ID,
+                 podcast_ids: Sequence[int] = DEFAULT_FEATURED_PODCAST_IDS, size: int = 10, ttl: float = 300,
+                 clock: Callable[[], float] = time.monotonic):
+        if source not in FEATURED_SOURCES:
+            raise ValueError(f"Unknown featured podcast source: {source}")
+        self._repo = repo
+        self._source = source
+        self._podcast_ids = tuple(podcast_ids)
+        self._size = size
+        self._ttl = ttl
+        self._clock = clock
+        # The cached summaries, when they expire and the change version they were fetched at, replaced together so
+        # concurrent requests see a matching set.
+        self._cached: Optional[Tuple[List[Mapping], float, int]] = None
 
-def podcast_to_dict(podcast: Podcast) -> Dict:
+    def podcasts(self) -> List[Mapping]:
+        now = self._clock()
+        version = self._repo.get_change_version()
+        cached = self._cached
+        if cached is not None and now < cached[1] and version == cached[2]:
+            return cached[0]
+        podcasts = podcast_summaries(self._fetch())
+        self._cached = (podcasts, now + self._ttl, version)
+        return podcasts
+
+    def _fetch(self):
+        if self._source == FEATURED_BY_ID:
+            return self._repo.get_podcasts_by_ids(self._podcast_ids[:self._size])
+        podcasts = [entry.podcast for entry in self._repo.get_leaderboard(self._source, self._size)]
+        if len(podcasts) < self._size:
+            ranked_ids = {podcast.id for podcast in podcasts}
+            podcast_ids = [podcast_id for podcast_id in self._podcast_ids if podcast_id not in ranked_ids]
+            podcasts += self._repo.get_podcasts_by_ids(podcast_ids[:self._size - len(podcasts)])
+        return podcasts
+
+
+def create_featured_podcasts(repo: AbstractRepository, config: Mapping) -> FeaturedPodcasts:
+    # FEATURED_PODCAST_IDS is a comma-separated list when set from the environment.
+    podcast_ids = config.get('FEATURED_PODCAST_IDS') or DEFAULT_FEATURED_PODCAST_IDS
+    if isinstance(podcast_ids, str):
+        podcast_ids = [int(podcast_id) for podcast_id in podcast_ids.split(',') if podcast_id.strip()]
+    return FeaturedPodcasts(repo, config.get('FEATURED_PODCASTS') or FEATURED_BY_ID, podcast_ids,
+                            config.get('FEATURED_PODCASTS_SIZE', 10), config.get('FEATURED_PODCASTS_TTL', 300))
+
+
+def get_homepage_podcasts(featured_podcasts: FeaturedPodcasts) -> Dict:
    return {
-       'id': podcast.id,
-       'title': podcast.title,
-       'author': podcast.author.name,
-       'image': podcast.image,
-       'description': podcast.description,
-       'website': podcast.website,
-       'itunes_id': podcast.itunes_id,
-       'language': podcast.language,
+       'podcasts': featured_podcasts.podcasts()
    }
-
-def podcasts_to_dict(podcasts: List[Podcast]) -> List[Dict]:
-   return [podcast_to_dict(podcast) for podcast in podcasts]
\ No newline at end of file
@@ -0,0 +1,82 @@
+import hashlib
+from pathlib import Path
+
+from flask import Flask, g, request, session
+
+from podcast.adapters.repository import AbstractRepository
+from podcast.adapters.snapshot import dataset_fingerprint
+
+# Pages rendered only from the repository and the request's URL, for visitors who are not logged in.
+CACHEABLE_ENDPOINTS = {
+    'home_bp.show_home',
+    'catalogue_bp.show_podcasts',
+    'podcast_description_bp.show_podcast_description',
+    'podcast_search_bp.show_podcast_search',
+    'leaderboard_bp.show_leaderboard',
+}
+
+# Files whose changes can change a cacheable page, relative to the podcast package.
+_SOURCE_PATTERNS = ('**/*.py', 'templates/**/*.html', 'static/**/*')
+
+
+def source_fingerprint() -> str:
+    """ Hashes the app's code, templates and static files, so that a deployment that changes them changes the ETags.
+
+    Every worker running the same files computes the same fingerprint.
+    """
+    package = Path(__file__).resolve().parent
+    digest = hashlib.sha1()
+    paths = sorted({path for pattern in _SOURCE_PATTERNS for path in package.glob(pattern)
+                    if path.is_file() and '__pycache__' not in path.parts})
+    for path in paths:
+        digest.update(path.relative_to(package).as_posix().encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _is_anonymous() -> bool:
+    # Flashed messages are shown once to the visitor they were meant for, so those pages are not shared either.
+    return 'user_name' not in session and '_flashes' not in session
+
+
+def register_http_caching(app: Flask, repo: AbstractRepository, data_path):
+    """ Sends strong ETags and Cache-Control for the CACHEABLE_ENDPOINTS when the visitor is not logged in, and
+    answers a request whose If-None-Match holds the current ETag with 304 Not Modified before the page is rendered.
+
+    The ETag covers the repository's change version, the URL, the source_fingerprint and the dataset in data_path.
+    The dataset is needed because the memory repository counts its writes from 0 each time it is loaded, whatever the
+    CSV files hold; a newly populated database starts its count at random instead (see load_data).
+    HTTP_CACHE_MAX_AGE sets how many seconds browsers and shared caches may reuse a page before revalidating it.
+    Pages for logged-in users are marked private.
+    """
+    fingerprint = f'{source_fingerprint()}:{dataset_fingerprint(data_path)}'
+    max_age = app.config.get('HTTP_CACHE_MAX_AGE', 0)
+
+    def cache_publicly(response):
+        response.set_etag(g.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.cache_control.must_revalidate = True
+        # Logging in changes the page at the same URL.
+        response.vary.add('Cookie')
+        return response
+
+    @app.before_request
+    def answer_unchanged_pages():
+        if request.method not in ('GET', 'HEAD') or request.endpoint not in CACHEABLE_ENDPOINTS or \
+                not _is_anonymous():
+            return None
+        key = f'{fingerprint}:{repo.get_change_version()}:{request.full_path}'
+        g.etag = hashlib.sha1(key.encode()).hexdigest()
+        if request.if_none_match.contains(g.etag):
+            return cache_publicly(app.response_class(status=304))
+        return None
+
+    @app.after_request
+    def add_cache_headers(response):
+        if 'etag' in g:
+            if response.status_code == 200:
+                cache_publicly(response)
+        elif request.endpoint in CACHEABLE_ENDPOINTS:
+            response.cache_control.private = True
+        return response
@@ -0,0 +1,27 @@
+from flask import Blueprint, abort, render_template, request
+from podcast.adapters.repository import AbstractRepository
+from podcast.leaderboard import services
+
+
+def create_leaderboard_blueprint(repo: AbstractRepository):
+    leaderboard_bp = Blueprint('leaderboard_bp', __name__)
+
+    @leaderboard_bp.route('/leaderboard', methods=['GET'])
+    def show_leaderboard():
+        leaderboard = request.args.get('board', next(iter(services.LEADERBOARD_TITLES)))
+        if leaderboard not in services.LEADERBOARD_TITLES:
+            abort(404)
+        category = request.args.get('category', '')
+        language = request.args.get('language', '')
+
+        results = services.get_leaderboard(leaderboard, category, language, repo)
+
+        return render_template('leaderboard.html',
+                               leaderboard=leaderboard,
+                               leaderboard_titles=services.LEADERBOARD_TITLES,
+                               categories=services.get_category_names(repo),
+                               selected_category=category,
+                               language=language,
+                               podcasts=results['podcasts'])
+
+    return leaderboard_bp
@@ -0,0 +1,32 @@
+from typing import Dict, List
+from podcast.adapters.repository import AbstractRepository, LeaderboardEntry, LEADERBOARD_TOP_RATED, \
+    LEADERBOARD_MOST_REVIEWED
+from podcast.serialisation import podcast_summary
+
+# Number of podcasts shown on a leaderboard.
+LEADERBOARD_SIZE = 10
+
+# Titles of the leaderboards offered, in the order they are listed.
+LEADERBOARD_TITLES = {
+    LEADERBOARD_TOP_RATED: 'Top Rated',
+    LEADERBOARD_MOST_REVIEWED: 'Most Reviewed',
+}
+
+
+def get_leaderboard(leaderboard: str, category: str, language: str, repo: AbstractRepository) -> Dict:
+    entries = repo.get_leaderboard(leaderboard, LEADERBOARD_SIZE, category or None, language or None)
+    return {
+        'podcasts': [entry_to_dict(entry) for entry in entries],
+    }
+
+
+def get_category_names(repo: AbstractRepository) -> List[str]:
+    return sorted({category.name for category in repo.get_all_categories()})
+
+
+def entry_to_dict(entry: LeaderboardEntry) -> Dict:
+    return {
+        **podcast_summary(entry.podcast),
+        'average_rating': entry.rating.average,
+        'review_count': entry.rating.count,
+    }
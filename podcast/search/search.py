@@ -12,26 +12,19 @@ def create_podcast_search_blueprint(repo: AbstractRepository):
         search_input = request.args.get('search-input', '')
         current_page = request.args.get('page', 1, type=int)
 
-        print(current_page)
-        podcasts = []
-        if search_input:
-            if selected_category == 'Title':
-                podcasts = services.get_podcasts_from_title(search_input, repo=repo)
-            elif selected_category == 'Author':
-                podcasts = services.get_podcasts_from_author(search_input, repo=repo)
-            elif selected_category == 'Category':
-                podcasts = services.get_podcasts_from_category(search_input, repo=repo)
-            elif selected_category == 'Language':
-                podcasts = services.get_podcasts_from_language(search_input, repo=repo)
+        # Next links carry the title and id of the last podcast shown, so the next page is read from there.
+        after_title = request.args.get('after_title')
+        after_id = request.args.get('after_id', type=int)
+        after = (after_title, after_id) if after_title is not None and after_id is not None else None
 
-        no_pages = (len(podcasts) + 9) // 10
-        podcasts = services.get_page(current_page, podcasts)
+        results = services.search_podcasts(search_input, selected_category, current_page, repo=repo, after=after)
 
         return render_template('podcastSearch.html',
                                selected_category=selected_category,
                                search_input=search_input,
-                               podcasts=podcasts,
+                               podcasts=results['podcasts'],
                                current_page=current_page,
-                               number_of_pages=no_pages)
+                               number_of_pages=results['number_of_pages'],
+                               next_cursor=results['next_cursor'])
 
     return podcast_search_bp
@@ -1,41 +1,54 @@
 from typing import List, Dict
-from podcast.adapters.repository import AbstractRepository
+from podcast.adapters.repository import AbstractRepository, PodcastCursor, SEARCH_TITLE, SEARCH_AUTHOR, SEARCH_CATEGORY, SEARCH_LANGUAGE
 from podcast.domainmodel.model import Podcast
+from podcast.serialisation import podcast_summaries
 
 def get_podcasts_from_title(title: str, repo: AbstractRepository) -> List[Podcast]:
-   podcasts = repo.get_all_podcasts()
-   return sorted([podcast for podcast in podcasts if title.lower() in podcast.title.lower()])
+   return repo.search_podcasts(title, SEARCH_TITLE)
 
 def get_podcasts_from_author(author: str, repo: AbstractRepository) -> List[Podcast]:
-   podcasts = repo.get_all_podcasts()
-   return sorted([podcast for podcast in podcasts if author.lower() in podcast.author.name.lower()])
+   return repo.search_podcasts(author, SEARCH_AUTHOR)
 
 def get_podcasts_from_category(category: str, repo: AbstractRepository) -> List[Podcast]:
-   podcasts = repo.get_all_podcasts()
-   return sorted([podcast for podcast in podcasts if any(category.lower() in cat.name.lower() for cat in podcast.categories)])
+   return repo.search_podcasts(category, SEARCH_CATEGORY)
 
 def get_podcasts_from_language(language: str, repo: AbstractRepository) -> List[Podcast]:
-   podcasts = repo.get_all_podcasts()
-   return sorted([podcast for podcast in podcasts if language.lower() in podcast.language.lower()])
+   return repo.search_podcasts(language, SEARCH_LANGUAGE)
+
+
+ITEMS_PER_PAGE = 10
+
+# Search fields offered by the search form's selectCategory drop-down.
+SEARCH_FIELDS_BY_CATEGORY = {
+    'Title': SEARCH_TITLE,
+    'Author': SEARCH_AUTHOR,
+    'Category': SEARCH_CATEGORY,
+    'Language': SEARCH_LANGUAGE,
+}
+
+
+def search_podcasts(search_input: str, selected_category: str, page: int, repo: AbstractRepository,
+                    after: PodcastCursor = None) -> Dict:
+   # Following a next_cursor reads the page straight after it, however deep; page is then only shown. Pages reached
+   # by number are read by offset.
+   field = SEARCH_FIELDS_BY_CATEGORY.get(selected_category)
+   if not search_input or field is None:
+      return {'podcasts': [], 'number_of_pages': 0, 'next_cursor': None}
+
+   offset = max(int(page) - 1, 0) * ITEMS_PER_PAGE
+   results = repo.search_podcasts_page(search_input, field, ITEMS_PER_PAGE, offset, after)
+   return {
+      'podcasts': podcast_summaries(results.items),
+      'number_of_pages': (results.total + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE,
+      'next_cursor': results.next_cursor
+   }
 
 
 def get_page(page: int, podcasts: List[Podcast]):
-    items_per_page = 10
+    items_per_page = ITEMS_PER_PAGE
     page = int(page)
 
     start_index = (page - 1) * items_per_page
     end_index = start_index + items_per_page
 
     return podcasts[start_index:end_index]
-
-def podcast_to_dict(podcast: Podcast) -> Dict:
-   return {
-       'id': podcast.id,
-       'title': podcast.title,
-       'author': podcast.author.name,
-       'image': podcast.image,
-       'description': podcast.description,
-       'website': podcast.website,
-       'itunes_id': podcast.itunes_id,
-       'language': podcast.language,
-   }
@@ -0,0 +1,67 @@
+import weakref
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+from podcast.domainmodel.model import Podcast
+
+# Cached views by podcast id: the podcast each was made from and its version at the time.
+_summaries: Dict[int, Tuple[weakref.ref, int, Mapping]] = {}
+_details: Dict[int, Tuple[weakref.ref, int, Mapping]] = {}
+
+
+def _cached_view(cache: Dict[int, Tuple[weakref.ref, int, Mapping]], podcast: Podcast, make_view) -> Mapping:
+    """ Returns the view of podcast in cache, making it again if the podcast is a different object or has changed.
+
+    The memory repository keeps its podcasts, so their views last until the podcast changes. Authors do not know all
+    of their podcasts, so a renamed author is noticed by comparing names instead. Podcasts loaded by the ORM are new
+    objects in every session and have no version, so their views are made afresh and not kept: they could never be
+    reused, and would hold the session's episodes in memory.
+    """
+    if podcast.version is None:
+        return MappingProxyType(make_view(podcast))
+    cached = cache.get(podcast.id)
+    if cached is not None:
+        cached_podcast, version, view = cached
+        if cached_podcast() is podcast and version == podcast.version and view['author'] == podcast.author.name:
+            return view
+    view = MappingProxyType(make_view(podcast))
+    cache[podcast.id] = (weakref.ref(podcast), podcast.version, view)
+    return view
+
+
+def _summary(podcast: Podcast) -> Dict:
+    return {
+        'id': podcast.id,
+        'title': podcast.title,
+        'author': podcast.author.name,
+        'image': podcast.image,
+        'description': podcast.description,
+        'website': podcast.website,
+        'itunes_id': podcast.itunes_id,
+        'language': podcast.language,
+    }
+
+
+def _detail(podcast: Podcast) -> Dict:
+    return {
+        **podcast_summary(podcast),
+        'categories': tuple(category.name for category in podcast.categories),
+        'episodes': tuple(sorted(podcast.episodes, key=lambda episode: episode.title)),
+    }
+
+
+def podcast_summary(podcast: Podcast) -> Mapping:
+    """ Returns a read-only view of the podcast's details, as listed in the home page, catalogue and search results. """
+    return _cached_view(_summaries, podcast, _summary)
+
+
+def podcast_summaries(podcasts: Sequence[Podcast]) -> List[Mapping]:
+    return [podcast_summary(podcast) for podcast in podcasts]
+
+
+def podcast_detail(podcast: Podcast) -> Mapping:
+    """ Returns a read-only view of the podcast's summary with its category names and episodes ordered by title.
+
+    Reviews change far more often than the rest of a podcast, so they are left for the caller to add.
+    """
+    return _cached_view(_details, podcast, _detail)
@@ -0,0 +1,48 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List
+
+
+class StartupTimer:
+    """ Records how long each phase of create_app takes, in the order the phases ran.
+
+    Phases may nest; time spent in a nested phase is only counted against the nested phase.
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        # Time spent in phases nested inside each phase that is currently running.
+        self._nested: List[float] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested.pop()
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed - nested
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def iterate(self, iterable: Iterable, name: str) -> Iterator:
+        """ Yields the items of iterable, counting the time taken to produce each of them against phase name. """
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    @property
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+    def report(self) -> str:
+        lines = [f"  {name:<24}{seconds * 1000:9.1f} ms" for name, seconds in self.timings.items()]
+        lines.append(f"  {'total':<24}{self.total * 1000:9.1f} ms")
+        return "STARTUP TIMINGS:\n" + "\n".join(lines)
@@ -1,6 +1,12 @@
+import re
+import secrets
+import shutil
 import pytest
 from flask import session
 
+from podcast import create_app
+from tests.conftest import TEST_DATA_PATH, AuthenticationManager
+
 
 def test_register(client):
     # Check that we can retrieve the register page.
@@ -158,3 +164,148 @@ def test_login_required_to_add_to_playlist(client):
     response = client.post('/add_to_playlist/1/1')
     assert response.status_code == 302
     assert response.headers['Location'] == '/authentication/login'
+
+def test_search(client):
+    response = client.get('/search?selectCategory=Author&search-input=Brian+Denny&page=1')
+    assert response.status_code == 200
+    assert b'Brian Denny Radio' in response.data
+
+    response = client.get('/search?selectCategory=Title&search-input=Radio&page=2')
+    assert response.status_code == 200
+    assert b'Previous' in response.data
+
+    # The Next link carries a cursor, and leads to the same page as paging by number.
+    response = client.get('/search?selectCategory=Title&search-input=Radio&page=1')
+    next_link = re.search(rb'class="navigation-arrows-next" href="([^"]+)"', response.data).group(1)
+    assert b'after_id=' in next_link and b'search-input=Radio' in next_link
+    response = client.get(next_link.replace(b'&amp;', b'&').decode())
+    assert response.status_code == 200
+    assert b'Previous' in response.data
+    listed = re.findall(rb'/description/(\d+)', response.data)
+    assert listed == re.findall(rb'/description/(\d+)',
+                                client.get('/search?selectCategory=Title&search-input=Radio&page=2').data)
+
+def test_catalogue_pages(client):
+    response = client.get('/podcasts?letter=S')
+    assert response.status_code == 200
+    assert b'Next' in response.data
+    assert b'First page' not in response.data
+    assert response.data.count(b'class="podcast-item"') == 50
+
+    next_link = re.search(rb'href="(/podcasts\?letter=S&amp;after_title=[^"]+)"', response.data).group(1)
+    response = client.get(next_link.replace(b'&amp;', b'&').decode())
+    assert response.status_code == 200
+    assert b'First page' in response.data
+    assert 0 < response.data.count(b'class="podcast-item"') <= 50
+
+def test_home_page_features_top_podcasts():
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': TEST_DATA_PATH,
+        'WTF_CSRF_ENABLED': False,
+        'FEATURED_PODCASTS': 'most-reviewed',
+        'FEATURED_PODCAST_IDS': '1',
+        'FEATURED_PODCASTS_SIZE': 2,
+    })
+    client = app.test_client()
+    response = client.get('/')
+    assert response.status_code == 200
+    assert response.data.count(b'class="podcast-item"') == 1
+
+    # Posting a review refreshes the featured podcasts.
+    client.post('/authentication/register', data={'user_name': 'newuser', 'password': 'Password123!'})
+    AuthenticationManager(client).login()
+    client.post('/review', data={'comment': 'Great podcast!', 'rating': 5, 'podcast_id': 2})
+    response = client.get('/')
+    assert response.data.count(b'class="podcast-item"') == 2
+    assert b'Brian Denny Radio' in response.data
+
+def test_anonymous_pages_are_revalidated_with_etags(client, auth, monkeypatch):
+    response = client.get('/podcasts?letter=S')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'public, max-age=0, must-revalidate'
+    assert 'Cookie' in response.headers['Vary']
+    assert client.get('/podcasts?letter=T').headers['ETag'] != etag
+
+    # An unchanged page is answered before the catalogue is read.
+    def fail(*args, **kwargs):
+        raise AssertionError("the catalogue was read")
+    monkeypatch.setattr('podcast.catalogue.services.get_podcasts_by_letter', fail)
+    response = client.get('/podcasts?letter=S', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+    monkeypatch.undo()
+
+    # Pages for a logged-in user are neither validated nor shared.
+    client.post('/authentication/register', data={'user_name': 'newuser', 'password': 'Password123!'})
+    auth.login()
+    response = client.get('/podcasts?letter=S', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert response.headers['Cache-Control'] == 'private'
+    client.post('/review', data={'comment': 'Great podcast!', 'rating': 5, 'podcast_id': 2})
+    auth.logout()
+    # The page showing the logged-out message is meant for this visitor only.
+    response = client.get('/podcasts?letter=S', headers={'If-None-Match': etag})
+    assert b'You are logged out.' in response.data
+    assert 'ETag' not in response.headers
+
+    # Registering and reviewing wrote to the repository, so the page is sent again.
+    response = client.get('/podcasts?letter=S', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_etags_change_with_the_dataset(tmp_path, monkeypatch):
+    data_path = tmp_path / 'data'
+    shutil.copytree(TEST_DATA_PATH, data_path)
+    # Start every app's change version at the same number, leaving only the dataset to tell their ETags apart.
+    monkeypatch.setattr(secrets, 'randbelow', lambda upper: 0)
+
+    def start():
+        return create_app({'TESTING': True, 'TEST_DATA_PATH': data_path, 'REPOSITORY': 'memory'}).test_client()
+
+    etag = start().get('/podcasts?letter=B').headers['ETag']
+    assert start().get('/podcasts?letter=B', headers={'If-None-Match': etag}).status_code == 304
+
+    # The restarted app has made as many writes as before, but the page it serves is different.
+    podcasts_csv = data_path / 'podcasts.csv'
+    podcasts_csv.write_text(podcasts_csv.read_text(encoding='utf-8').replace('Brian Denny Radio', 'Brian Denny Live'),
+                            encoding='utf-8')
+    response = start().get('/podcasts?letter=B', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Brian Denny Live' in response.data
+    assert response.headers['ETag'] != etag
+
+def test_separately_started_apps_never_share_etags():
+    def start():
+        return create_app({'TESTING': True, 'TEST_DATA_PATH': TEST_DATA_PATH, 'REPOSITORY': 'memory'}).test_client()
+
+    # Two workers, or an app before and after a restart, may hold different reviews after the same number of writes.
+    etags = {start().get('/description/1').headers['ETag'] for _ in range(2)}
+    assert len(etags) == 2
+
+def test_leaderboard(client, auth):
+    response = client.get('/leaderboard')
+    assert response.status_code == 200
+    assert b'No podcasts have been reviewed yet.' in response.data
+
+    client.post('/authentication/register', data={'user_name': 'newuser', 'password': 'Password123!'})
+    auth.login(user_name='newuser', password='Password123!')
+    client.post('/review', data={'comment': 'Great podcast!', 'rating': 5, 'podcast_id': 2})
+
+    response = client.get('/leaderboard?board=most-reviewed&category=Comedy')
+    assert response.status_code == 200
+    assert b'Brian Denny Radio' in response.data
+    assert b'5.0 / 5 stars from 1 review' in response.data
+
+    assert client.get('/leaderboard?board=loudest').status_code == 404
+
+def test_startup_parses_the_dataset_once_and_reports_timings():
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': TEST_DATA_PATH,
+        'REPOSITORY': 'memory',
+    })
+    assert list(app.config['STARTUP_TIMINGS']) == ['CSV parse', 'repository population', 'linking',
+                                                   'blueprint registration']
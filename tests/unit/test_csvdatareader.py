@@ -1,9 +1,11 @@
-gitfrom datetime import datetime
+from datetime import datetime, timedelta, timezone
 from unittest.mock import patch, mock_open
 import os
 import pytest
 from podcast.domainmodel.model import Podcast, Episode, Author, Category
-from podcast.adapters.datareader.csvdatareader import CSVDataReader
+from podcast.adapters.datareader.csvdatareader import CSVDataReader, parse_pub_date, _record_ranges, \
+    _read_episode_range
+from tests.conftest import TEST_DATA_PATH
 
 @pytest.fixture
 def csv_data_reader():
@@ -107,6 +109,90 @@ def test_read_episodes(csv_data_reader):
     assert episode2.pub_date == datetime(2024, 1, 2)
 
 
+# Tests for decoding pub dates
+@pytest.mark.parametrize('pub_date, expected', [
+    ('2017-12-01 00:09:47+00', datetime(2017, 12, 1, 0, 9, 47, tzinfo=timezone.utc)),
+    ('2017-12-01 00:09:47+0000', datetime(2017, 12, 1, 0, 9, 47, tzinfo=timezone.utc)),
+    ('2017-12-01 00:09:47+0530', datetime(2017, 12, 1, 0, 9, 47, tzinfo=timezone(timedelta(hours=5, minutes=30)))),
+    ('2017-12-01 00:09:47-05', datetime(2017, 12, 1, 0, 9, 47, tzinfo=timezone(timedelta(hours=-5)))),
+    ('2017-12-01', datetime(2017, 12, 1)),
+])
+def test_parse_pub_date(pub_date, expected):
+    parsed = parse_pub_date(pub_date)
+    assert parsed == expected
+    assert parsed.utcoffset() == expected.utcoffset()
+
+def test_parse_pub_date_rejects_invalid_dates():
+    with pytest.raises(ValueError):
+        parse_pub_date('2017-13-01 00:09:47+00')
+    with pytest.raises(ValueError):
+        parse_pub_date('yesterday')
+
+
+def test_iter_podcasts_streams_the_same_podcasts_as_read_podcasts():
+    reader = CSVDataReader(TEST_DATA_PATH)
+    podcasts = reader.iter_podcasts()
+
+    first = next(podcasts)
+    assert first.id == 1
+    assert reader.podcasts == []
+    streamed = [first] + list(podcasts)
+
+    reader = CSVDataReader(TEST_DATA_PATH)
+    reader.read_podcasts()
+    assert streamed == reader.podcasts
+    assert [[category.id for category in podcast.categories] for podcast in streamed] == \
+        [[category.id for category in podcast.categories] for podcast in reader.podcasts]
+    assert reader.categories == {category for podcast in streamed for category in podcast.categories}
+
+def test_iter_episodes_streams_the_same_episodes_as_read_episodes():
+    reader = CSVDataReader(TEST_DATA_PATH)
+    streamed = list(reader.iter_episodes())
+    assert reader.episodes == []
+
+    reader.read_episodes()
+    assert [(episode.id, episode.podcast_id, episode.pub_date) for episode in streamed] == \
+        [(episode.id, episode.podcast_id, episode.pub_date) for episode in reader.episodes]
+
+
+def episode_fields(episodes):
+    return [(e.id, e.podcast_id, e.title, e.audio, e.audio_length, e.description, e.pub_date) for e in episodes]
+
+@pytest.fixture
+def multiline_episodes_folder(tmp_path):
+    # Descriptions spanning several lines, with quoted commas and doubled quotes, as found in real exports.
+    rows = ["id,podcast_id,title,audio,audio_length,description,pub_date"]
+    for episode_id in range(1, 41):
+        description = f'"Part {episode_id}, with ""quotes""\nand a second line\r\n\nand a third"' \
+            if episode_id % 3 else f"Short {episode_id}"
+        rows.append(f"{episode_id},1,Episode {episode_id},http://audio/{episode_id}.mp3,{episode_id * 60},"
+                    f"{description},2017-12-01 00:09:{episode_id:02d}+00")
+    (tmp_path / "episodes.csv").write_bytes("\r\n".join(rows).encode('utf-8') + b"\r\n")
+    return tmp_path
+
+def test_record_ranges_only_split_between_records(multiline_episodes_folder):
+    filepath = str(multiline_episodes_folder / "episodes.csv")
+    serial = episode_fields(CSVDataReader(multiline_episodes_folder).iter_episodes())
+
+    for parts in (1, 2, 3, 7, 100):
+        ranges = _record_ranges(filepath, parts)
+        assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+        rows = [fields for start, end in ranges for fields in _read_episode_range(filepath, start, end)]
+        assert episode_fields(Episode(*fields) for fields in rows) == serial
+
+def test_parallel_read_episodes_matches_serial_read(multiline_episodes_folder):
+    serial = CSVDataReader(multiline_episodes_folder)
+    serial.read_episodes()
+    parallel = CSVDataReader(multiline_episodes_folder)
+    parallel.read_episodes(workers=2)
+
+    assert len(serial.episodes) == 40
+    assert "and a second line\n\nand a third" in serial.episodes[0].description
+    assert episode_fields(parallel.episodes) == episode_fields(serial.episodes)
+    assert episode_fields(CSVDataReader(TEST_DATA_PATH).iter_episodes(workers=2)) == \
+        episode_fields(CSVDataReader(TEST_DATA_PATH).iter_episodes())
+
+
 # Tests to check initial state of CSVDataReader
 def test_podcasts(csv_data_reader):
     assert csv_data_reader.podcasts == [] 
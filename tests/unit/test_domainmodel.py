@@ -1,5 +1,6 @@
 import pytest
-from podcast.domainmodel.model import Author, Podcast, Category, User, PodcastSubscription, Episode, Review, Playlist
+from podcast.domainmodel.model import Author, Podcast, Category, User, PodcastSubscription, Episode, Review, Playlist, \
+    OrderedSet
 from podcast.adapters.datareader.csvdatareader import CSVDataReader
 from datetime import date, datetime
 
@@ -636,4 +637,47 @@ def test_playlist_hash(my_playlist):
 
     # Change playlist id and check that the hash is different
     my_playlist._id = 2
-    assert hash(my_playlist) != hash(playlist1)
\ No newline at end of file
+    assert hash(my_playlist) != hash(playlist1)
+
+
+def test_ordered_set_keeps_insertion_order_without_duplicates():
+    items = OrderedSet([3, 1, 2, 1])
+    assert list(items) == [3, 1, 2]
+    assert items[0] == 3 and items[-1] == 2 and items[1:] == [1, 2]
+
+    items.add(3)
+    items.append(4)
+    items.discard(1)
+    items.discard(5)
+    assert list(items) == [3, 2, 4]
+    assert items[1] == 2
+    assert 1 not in items and 4 in items
+
+    with pytest.raises(KeyError):
+        items.remove(1)
+    items.remove(4)
+    assert list(reversed(items)) == [2, 3]
+
+def test_podcast_collections_do_not_hold_duplicates(my_podcast):
+    episodes = [Episode(episode_id, my_podcast.id, 60, f"Episode {episode_id}") for episode_id in range(1, 1001)]
+    for episode in episodes + episodes:
+        my_podcast.add_episode(episode)
+    assert list(my_podcast.episodes) == episodes
+
+    my_podcast.remove_episode(episodes[0])
+    my_podcast.remove_episode(episodes[0])
+    assert len(my_podcast.episodes) == 999
+    assert my_podcast.episodes[0] == episodes[1]
+
+
+def test_podcast_version_counts_changes_other_than_reviews():
+    podcast = Podcast(100, Author(1, "Joe Toste"), "Joe Toste Podcast")
+    assert podcast.version == 0
+
+    podcast.title = "New Title"
+    podcast.add_category(Category(1, "Comedy"))
+    podcast.add_episode(Episode(1, 100, 60, "Episode"))
+    assert podcast.version == 3
+
+    podcast.add_review(Review(1, podcast, User(1, "user", "Password123"), 5, "Great"))
+    assert podcast.version == 3
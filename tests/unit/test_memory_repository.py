@@ -1,8 +1,13 @@
+import shutil
+
 import pytest
 from datetime import date
 
 from podcast.domainmodel.model import Podcast, Episode, Author, Category, Review, Playlist, User
-from podcast.adapters.memoryRepository import MemoryRepository
+from podcast.adapters.memoryRepository import MemoryRepository, populate
+from podcast.adapters.repository import Page, catalogue_letter
+from podcast.adapters import snapshot
+from tests.conftest import TEST_DATA_PATH
 
 @pytest.fixture
 def in_memory_repo():
@@ -21,6 +26,17 @@ def test_repository_can_retrieve_a_user_by_username(in_memory_repo):
     retrieved_user = in_memory_repo.get_user_by_username("Shyamli")
     assert retrieved_user == user
 
+def test_repository_retrieves_users_by_their_stored_username(in_memory_repo):
+    users = [User(user_id, f"user{user_id}", "pw12345") for user_id in range(1, 1001)]
+    for user in users:
+        in_memory_repo.add_user(user)
+    upper_case = User(1001, " User7 ", "pw12345")
+    in_memory_repo.add_user(upper_case)
+
+    assert in_memory_repo.get_user_by_username("user500") is users[499]
+    assert in_memory_repo.get_user_by_username("  user7\t") is users[6]
+    assert in_memory_repo.get_user_by_username("User7") is upper_case
+
 def test_repository_does_not_retrieve_a_non_existent_user(in_memory_repo):
     user = in_memory_repo.get_user_by_username("gdsfgdsfgsdfgsdfgdsf")
     assert user is None
@@ -32,6 +48,28 @@ def test_repository_can_add_a_podcast(in_memory_repo):
     in_memory_repo.add_podcast(podcast)
     assert in_memory_repo.get_podcast(podcast.id) == podcast
 
+def test_repository_change_version_counts_writes(in_memory_repo):
+    start = in_memory_repo.get_change_version()
+    author = Author(1, "Author1")
+    podcast = Podcast(1, author, "Podcast1")
+    in_memory_repo.add_author(author)
+    in_memory_repo.add_podcast(podcast)
+    assert in_memory_repo.get_change_version() == start + 2
+
+    in_memory_repo.get_podcast(1)
+    in_memory_repo.search_podcasts("pod", "title")
+    assert in_memory_repo.get_change_version() == start + 2
+
+    user = User(1, "user1", "Password123")
+    in_memory_repo.add_user(user)
+    in_memory_repo.add_review_to_podcast(Review(1, podcast, user, 5, "Great"), podcast)
+    playlist = Playlist(1, user, "Playlist")
+    in_memory_repo.add_playlist(playlist)
+    episode = Episode(1, 1, 60, "Episode1")
+    in_memory_repo.add_episode_to_playlist(episode, playlist)
+    in_memory_repo.remove_episode_from_playlist(episode, playlist)
+    assert in_memory_repo.get_change_version() == start + 7
+
 def test_repository_can_retrieve_a_podcast(in_memory_repo):
     author = Author(1, "Author1")
     podcast = Podcast(1, author, "Podcast1")
@@ -39,6 +77,21 @@ def test_repository_can_retrieve_a_podcast(in_memory_repo):
     retrieved_podcast = in_memory_repo.get_podcast(1)
     assert retrieved_podcast == podcast
 
+def test_repository_can_retrieve_podcast_details(in_memory_repo):
+    podcast = Podcast(1, Author(1, "Author1"), "Podcast1")
+    in_memory_repo.add_podcast(podcast)
+    assert in_memory_repo.get_podcast_details(1) is podcast
+    assert in_memory_repo.get_podcast_details(2) is None
+
+def test_repository_can_retrieve_podcasts_by_ids(in_memory_repo):
+    author = Author(1, "Author1")
+    podcast1 = Podcast(1, author, "Podcast1")
+    podcast2 = Podcast(2, author, "Podcast2")
+    in_memory_repo.add_podcast(podcast1)
+    in_memory_repo.add_podcast(podcast2)
+    assert in_memory_repo.get_podcasts_by_ids([2, 3, 1]) == [podcast2, podcast1]
+    assert in_memory_repo.get_podcasts_by_ids([]) == []
+
 def test_repository_can_retrieve_all_podcasts(in_memory_repo):
     author = Author(1, "Author1")
     podcast1 = Podcast(1, author, "Podcast1")
@@ -50,6 +103,79 @@ def test_repository_can_retrieve_all_podcasts(in_memory_repo):
     assert podcast1 in podcasts
     assert podcast2 in podcasts
 
+def test_repository_can_search_podcasts(in_memory_repo):
+    author1 = Author(1, "Jane Smith")
+    author2 = Author(2, "John Doe")
+    podcast1 = Podcast(1, author1, "Morning Radio", language="English")
+    podcast2 = Podcast(2, author2, "Radio Hour", language="Spanish")
+    podcast3 = Podcast(3, author2, "Late Show", language="English")
+    podcast1.add_category(Category(1, "News"))
+    podcast3.add_category(Category(2, "Comedy News"))
+    for podcast in (podcast1, podcast2, podcast3):
+        in_memory_repo.add_podcast(podcast)
+
+    assert in_memory_repo.search_podcasts("radio", "title") == [podcast1, podcast2]
+    assert in_memory_repo.search_podcasts("o", "title") == [podcast3, podcast1, podcast2]
+    assert in_memory_repo.search_podcasts("DOE", "author") == [podcast3, podcast2]
+    assert in_memory_repo.search_podcasts("news", "category") == [podcast3, podcast1]
+    assert in_memory_repo.search_podcasts("spa", "language") == [podcast2]
+    assert in_memory_repo.search_podcasts("podcast", "title") == []
+
+def test_repository_can_page_search_results(in_memory_repo):
+    author = Author(1, "Author1")
+    podcasts = [Podcast(i, author, f"Podcast {i:02d}") for i in range(1, 26)]
+    for podcast in reversed(podcasts):
+        in_memory_repo.add_podcast(podcast)
+
+    assert in_memory_repo.count_search_results("podcast", "title") == 25
+    assert in_memory_repo.search_podcasts("podcast", "title", 0, 10) == podcasts[0:10]
+    assert in_memory_repo.search_podcasts("podcast", "title", 20, 10) == podcasts[20:25]
+    assert in_memory_repo.search_podcasts("podcast", "title", 30, 10) == []
+
+def test_repository_can_page_search_results_by_cursor(in_memory_repo):
+    author = Author(1, "Author1")
+    podcasts = [Podcast(i, author, f"Podcast {i // 2:02d}") for i in range(1, 26)]
+    for podcast in podcasts:
+        in_memory_repo.add_podcast(podcast)
+
+    page = in_memory_repo.search_podcasts_page("podcast", "title", 10, offset=10)
+    assert page.items == podcasts[10:20]
+    assert page.total == 25
+    assert page.next_cursor == (podcasts[19].title, podcasts[19].id)
+
+    page = in_memory_repo.search_podcasts_page("podcast", "title", 10, after=page.next_cursor)
+    assert page.items == podcasts[20:25]
+    assert page.next_cursor is None
+
+def test_repository_search_reflects_re_added_podcast(in_memory_repo):
+    author = Author(1, "Author1")
+    podcast = Podcast(1, author, "Morning Radio")
+    in_memory_repo.add_podcast(podcast)
+    podcast.title = "Evening Show"
+    in_memory_repo.add_podcast(podcast)
+
+    assert in_memory_repo.search_podcasts("radio", "title") == []
+    assert in_memory_repo.search_podcasts("evening", "title") == [podcast]
+
+def test_repository_search_rejects_unknown_field(in_memory_repo):
+    with pytest.raises(ValueError):
+        in_memory_repo.search_podcasts("radio", "website")
+
+def test_repository_can_get_previous_and_next_podcast_ids(in_memory_repo):
+    author = Author(1, "Author1")
+    for podcast in [Podcast(1, author, "banana"), Podcast(2, author, "Apple"), Podcast(3, author, "cherry"),
+                    Podcast(4, author, "apple")]:
+        in_memory_repo.add_podcast(podcast)
+
+    assert in_memory_repo.get_previous_and_next_podcast_ids(2) == (None, 4)
+    assert in_memory_repo.get_previous_and_next_podcast_ids(4) == (2, 1)
+    assert in_memory_repo.get_previous_and_next_podcast_ids(3) == (1, None)
+    assert in_memory_repo.get_previous_and_next_podcast_ids(5) == (None, None)
+
+    in_memory_repo.add_podcast(Podcast(5, author, "Blueberry"))
+    assert in_memory_repo.get_previous_and_next_podcast_ids(1) == (4, 5)
+    assert in_memory_repo.get_previous_and_next_podcast_ids(3) == (5, None)
+
 # Episode Tests
 def test_repository_can_add_an_episode(in_memory_repo):
     episode = Episode(1, 1, 60, "Episode1")
@@ -144,6 +270,100 @@ def test_repository_can_get_reviews_for_podcast(in_memory_repo):
     assert review1 in reviews
     assert review2 in reviews
 
+def test_repository_keeps_a_rating_summary_per_podcast(in_memory_repo):
+    user = User(1, "Shyamli", "pw12345")
+    podcast = Podcast(1, Author(1, "Author1"), "Podcast1")
+    other_podcast = Podcast(2, Author(1, "Author1"), "Podcast2")
+    in_memory_repo.add_podcast(podcast)
+    in_memory_repo.add_podcast(other_podcast)
+
+    assert in_memory_repo.get_rating_summary(1) == (0, 0, (0, 0, 0, 0, 0))
+    in_memory_repo.add_review_to_podcast(Review(1, podcast, user, 5, "Great"), podcast)
+    in_memory_repo.add_review(Review(2, podcast, user, 2, "Poor"))
+    in_memory_repo.add_review(Review(3, other_podcast, user, 4, "Good"))
+    # Storing a review again does not count it twice.
+    in_memory_repo.add_review(in_memory_repo.get_review(1))
+
+    summary = in_memory_repo.get_rating_summary(1)
+    assert (summary.count, summary.total, summary.histogram) == (2, 7, (0, 1, 0, 0, 1))
+    assert summary.average == 3.5
+    assert in_memory_repo.get_rating_summary(2).average == 4.0
+
+def test_repository_ranks_reviewed_podcasts_on_leaderboards():
+    repo = MemoryRepository()
+    populate(repo, TEST_DATA_PATH)
+    user = User(1, "Shyamli", "pw12345")
+    ratings = {1: [4, 4], 2: [5], 3: [5, 3, 4], 4: [2, 2, 2, 2]}
+    review_id = 1
+    for podcast_id, podcast_ratings in ratings.items():
+        for rating in podcast_ratings:
+            repo.add_review(Review(review_id, repo.get_podcast(podcast_id), user, rating, "content"))
+            review_id += 1
+
+    def ids(leaderboard, **scope):
+        return [entry.podcast.id for entry in repo.get_leaderboard(leaderboard, 10, **scope)]
+
+    assert ids('top-rated') == [2, 3, 1, 4]
+    assert ids('most-reviewed') == [4, 3, 1, 2]
+    assert ids('top-rated', language='Italian') == [3]
+    assert ids('top-rated', category='Comedy') == [2]
+    assert repo.get_leaderboard('top-rated', 2)[1].rating.average == 4.0
+
+    # A poor review moves podcast 2 below the podcasts it led; of the two averaging 4, 3 has more reviews.
+    repo.add_review(Review(review_id, repo.get_podcast(2), user, 1, "content"))
+    assert ids('top-rated') == [3, 1, 2, 4]
+    assert ids('top-rated', category='Comedy') == [2]
+    assert ids('most-reviewed') == [4, 3, 1, 2]
+
+    with pytest.raises(ValueError):
+        repo.get_leaderboard('loudest', 10)
+
+def test_catalogue_letter():
+    assert catalogue_letter("alpha") == 'A'
+    assert catalogue_letter("Zulu") == 'Z'
+    assert catalogue_letter("99% Invisible") == '#'
+    assert catalogue_letter("Émission") == '#'
+    assert catalogue_letter("ısık") == '#'
+
+
+def test_repository_lists_podcasts_by_letter_in_title_order(in_memory_repo):
+    author = Author(1, "Author1")
+    for podcast_id, title in [(1, "beta"), (2, "Alpha"), (3, "apple"), (4, "42"), (5, "Bravo")]:
+        in_memory_repo.add_podcast(Podcast(podcast_id, author, title))
+
+    assert [podcast.id for podcast in in_memory_repo.get_podcasts_by_letter('A', 10).items] == [2, 3]
+    assert [podcast.id for podcast in in_memory_repo.get_podcasts_by_letter('#', 10).items] == [4]
+    assert in_memory_repo.get_podcasts_by_letter('C', 10) == Page([], 0, None)
+
+    # Retitling a podcast moves it between letters.
+    retitled = in_memory_repo.get_podcast(4)
+    retitled.title = "Apex"
+    in_memory_repo.add_podcast(retitled)
+    assert [podcast.id for podcast in in_memory_repo.get_podcasts_by_letter('A', 10).items] == [2, 4, 3]
+    assert in_memory_repo.get_podcasts_by_letter('#', 10).items == []
+
+
+def test_repository_pages_through_a_letter_with_a_cursor(in_memory_repo):
+    author = Author(1, "Author1")
+    for podcast_id, title in [(1, "apple"), (2, "Alpha"), (3, "Apple"), (4, "aardvark"), (5, "Axe")]:
+        in_memory_repo.add_podcast(Podcast(podcast_id, author, title))
+
+    first_page = in_memory_repo.get_podcasts_by_letter('A', 2)
+    assert [podcast.id for podcast in first_page.items] == [4, 2]
+    assert first_page.total == 5
+    assert first_page.next_cursor == ("Alpha", 2)
+
+    # Titles differing only in case are ordered by id, and the cursor resumes between them.
+    second_page = in_memory_repo.get_podcasts_by_letter('A', 2, after=first_page.next_cursor)
+    assert [podcast.id for podcast in second_page.items] == [1, 3]
+    third_page = in_memory_repo.get_podcasts_by_letter('A', 2, after=("apple", 1))
+    assert [podcast.id for podcast in third_page.items] == [3, 5]
+    assert third_page.next_cursor is None
+
+    last_page = in_memory_repo.get_podcasts_by_letter('A', 2, after=second_page.next_cursor)
+    assert [podcast.id for podcast in last_page.items] == [5]
+    assert last_page.next_cursor is None
+
 # Playlist Tests
 def test_repository_can_add_a_playlist(in_memory_repo):
     user = User(in_memory_repo.get_next_user_id(),"Shyamli", "pw12345")
@@ -195,6 +415,23 @@ def test_repository_can_get_playlist_by_user(in_memory_repo):
 
     assert retrieved_playlist == playlist
 
+
+def test_repository_keeps_each_users_playlists_in_id_order(in_memory_repo):
+    user = User(in_memory_repo.get_next_user_id(), "Shyamli", "pw12345")
+    other_user = User(in_memory_repo.get_next_user_id(), "Ezekiel", "pw12345")
+    later = Playlist(3, user, "Later")
+    first = Playlist(1, user, "First")
+    others = Playlist(2, other_user, "Others")
+
+    for playlist in (later, others, first):
+        in_memory_repo.add_playlist(playlist)
+
+    assert in_memory_repo.get_playlists_by_user(user) == [first, later]
+    assert in_memory_repo.get_playlist_by_user(user) == first
+    assert in_memory_repo.get_playlists_by_user(other_user) == [others]
+    assert in_memory_repo.get_playlists_by_user(User(99, "Nobody", "pw12345")) == []
+    assert in_memory_repo.get_playlist_by_user(User(99, "Nobody", "pw12345")) is None
+
 # ID Generation Tests
 def test_repository_can_generate_next_review_id(in_memory_repo):
     next_id = in_memory_repo.get_next_review_id()
@@ -206,4 +443,48 @@ def test_repository_can_generate_next_playlist_id(in_memory_repo):
     next_id = in_memory_repo.get_next_playlist_id()
     assert next_id == 1
     next_id = in_memory_repo.get_next_playlist_id()
-    assert next_id == 2
\ No newline at end of file
+    assert next_id == 2
+
+# Snapshot Tests
+@pytest.fixture
+def data_path(tmp_path):
+    path = tmp_path / "data"
+    shutil.copytree(TEST_DATA_PATH, path)
+    return path
+
+def test_repository_is_populated_from_a_snapshot(in_memory_repo, data_path, tmp_path, monkeypatch):
+    snapshot_path = tmp_path / "dataset.snapshot"
+    populate(in_memory_repo, data_path, snapshot_path)
+    assert snapshot_path.exists()
+
+    # A current snapshot is used without parsing the CSV files again.
+    monkeypatch.setattr('podcast.adapters.memoryRepository.CSVDataReader', None)
+    repo = MemoryRepository()
+    populate(repo, data_path, snapshot_path)
+
+    podcast = repo.get_podcast(1)
+    assert podcast == in_memory_repo.get_podcast(1)
+    assert len(podcast.episodes) == len(in_memory_repo.get_podcast(1).episodes)
+    assert repo.search_podcasts("radio", "title") == in_memory_repo.search_podcasts("radio", "title")
+    # Each process counts its own writes, so the change version is not taken from the snapshot.
+    assert repo.get_change_version() != in_memory_repo.get_change_version()
+
+def test_stale_snapshot_is_rebuilt(in_memory_repo, data_path, tmp_path):
+    snapshot_path = tmp_path / "dataset.snapshot"
+    populate(in_memory_repo, data_path, snapshot_path)
+
+    with open(data_path / "podcasts.csv", "a", encoding="utf-8") as csv_file:
+        csv_file.write("99999,Snapshot Test,,,English,Arts,,Someone,\n")
+
+    assert not snapshot.load_snapshot(MemoryRepository(), snapshot_path, data_path)
+    repo = MemoryRepository()
+    populate(repo, data_path, snapshot_path)
+    assert repo.get_podcast(99999).title == "Snapshot Test"
+    assert snapshot.load_snapshot(MemoryRepository(), snapshot_path, data_path)
+
+def test_snapshot_of_another_format_version_is_ignored(in_memory_repo, data_path, tmp_path, monkeypatch):
+    snapshot_path = tmp_path / "dataset.snapshot"
+    populate(in_memory_repo, data_path, snapshot_path)
+
+    monkeypatch.setattr(snapshot, 'SNAPSHOT_FORMAT_VERSION', snapshot.SNAPSHOT_FORMAT_VERSION + 1)
+    assert not snapshot.load_snapshot(MemoryRepository(), snapshot_path, data_path)
@@ -1,11 +1,14 @@
 from podcast.domainmodel.model import Podcast, Author, Category, Episode, User, Review
 from podcast.adapters.memoryRepository import MemoryRepository, populate
-from podcast.catalogue.services import get_podcasts_by_letter
+from podcast.catalogue.services import get_podcasts_by_letter, CATALOGUE_PAGE_SIZE
 from podcast.description.services import get_podcast_data, get_previous_and_next_podcast_ids, add_review_to_podcast, create_playlist, calculate_average_rating
 from podcast.exceptions import NonExistentEpisodeException, NonExistentPodcastException, UnknownUserException
 from podcast.playlist.services import get_user_playlist, get_user_by_username, remove_from_playlist
 from podcast.authentication.services import add_user, authenticate_user, AuthenticationException, UnknownUserException
-from podcast.search.services import get_podcasts_from_title, get_podcasts_from_language, get_podcasts_from_author, get_podcasts_from_category, get_page
+from podcast.leaderboard.services import get_leaderboard
+from podcast.home.services import FeaturedPodcasts, create_featured_podcasts, get_homepage_podcasts
+from podcast.serialisation import podcast_summary, podcast_detail
+from podcast.search.services import get_podcasts_from_title, get_podcasts_from_language, get_podcasts_from_author, get_podcasts_from_category, get_page, search_podcasts
 
 from werkzeug.security import  check_password_hash
 
@@ -102,6 +105,25 @@ def test_get_podcasts_by_letter_with_no_matches(in_memory_repo):
     assert len(podcasts_as_dict['podcasts']) == 0
 
 
+def test_get_podcasts_by_letter_pages_with_a_cursor(in_memory_repo):
+    first_page = get_podcasts_by_letter('S', in_memory_repo)
+    assert len(first_page['podcasts']) == CATALOGUE_PAGE_SIZE
+    assert first_page['number_of_podcasts'] > CATALOGUE_PAGE_SIZE
+    last = first_page['podcasts'][-1]
+    assert first_page['next_cursor'] == (last['title'], last['id'])
+
+    listed = first_page['podcasts']
+    after = first_page['next_cursor']
+    while after is not None:
+        page = get_podcasts_by_letter('s', in_memory_repo, after=after)
+        listed += page['podcasts']
+        after = page['next_cursor']
+    assert len(listed) == first_page['number_of_podcasts']
+    assert len({podcast['id'] for podcast in listed}) == len(listed)
+    assert [(podcast['title'].lower(), podcast['id']) for podcast in listed] == \
+        sorted((podcast['title'].lower(), podcast['id']) for podcast in listed)
+
+
 def test_get_user_playlist(in_memory_repo, user, playlist):
     playlist1 = get_user_playlist(user, in_memory_repo)
 
@@ -156,6 +178,63 @@ def test_calculate_average_rating(in_memory_repo, podcast, user):
     assert isinstance(average_rating, float)
     assert 4.5 == average_rating
 
+def test_podcast_description_average_comes_from_the_rating_summary(in_memory_repo, user):
+    podcast = in_memory_repo.get_podcast(1)
+    add_review_to_podcast(user, 4, "content1", podcast, in_memory_repo)
+    add_review_to_podcast(user, 3, "content2", podcast, in_memory_repo)
+
+    assert in_memory_repo.get_rating_summary(1).histogram == (0, 0, 1, 1, 0)
+    assert get_podcast_data(1, in_memory_repo)['average_rating'] == 3.5
+
+def test_get_leaderboard(in_memory_repo, user):
+    assert get_leaderboard('top-rated', '', '', in_memory_repo)['podcasts'] == []
+
+    add_review_to_podcast(user, 3, "content1", in_memory_repo.get_podcast(1), in_memory_repo)
+    add_review_to_podcast(user, 5, "content2", in_memory_repo.get_podcast(3), in_memory_repo)
+    add_review_to_podcast(user, 4, "content3", in_memory_repo.get_podcast(3), in_memory_repo)
+
+    podcasts = get_leaderboard('top-rated', '', '', in_memory_repo)['podcasts']
+    assert [(podcast['id'], podcast['average_rating'], podcast['review_count']) for podcast in podcasts] == \
+        [(3, 4.5, 2), (1, 3.0, 1)]
+    podcasts = get_leaderboard('most-reviewed', '', 'English', in_memory_repo)['podcasts']
+    assert [podcast['id'] for podcast in podcasts] == [1]
+    # Languages are typed in, so their case does not matter.
+    assert get_leaderboard('most-reviewed', '', 'english', in_memory_repo)['podcasts'] == podcasts
+
+def test_featured_podcasts_by_id(in_memory_repo):
+    featured = FeaturedPodcasts(in_memory_repo, podcast_ids=[3, 1, 5000, 2], size=3)
+    assert [podcast['id'] for podcast in get_homepage_podcasts(featured)['podcasts']] == [3, 1]
+
+    featured = create_featured_podcasts(in_memory_repo, {'FEATURED_PODCAST_IDS': '4, 2'})
+    assert [podcast['id'] for podcast in featured.podcasts()] == [4, 2]
+    assert [podcast['id'] for podcast in create_featured_podcasts(in_memory_repo, {}).podcasts()] == \
+        list(range(1, 11))
+
+    with pytest.raises(ValueError):
+        FeaturedPodcasts(in_memory_repo, 'loudest')
+
+
+def test_featured_podcasts_are_cached_until_they_expire_or_the_repository_changes(in_memory_repo, user):
+    now = [0.0]
+    featured = FeaturedPodcasts(in_memory_repo, 'most-reviewed', podcast_ids=[1, 2, 3], size=2, ttl=60,
+                                clock=lambda: now[0])
+    # Until podcasts are reviewed, the leaderboard is topped up from the ids.
+    podcasts = featured.podcasts()
+    assert [podcast['id'] for podcast in podcasts] == [1, 2]
+
+    now[0] = 59.0
+    assert featured.podcasts() is podcasts
+    now[0] = 60.0
+    podcasts = featured.podcasts()
+    assert [podcast['id'] for podcast in podcasts] == [1, 2]
+
+    # A review written through any worker moves the change version, which every worker checks.
+    add_review_to_podcast(user, 3, "content", in_memory_repo.get_podcast(3), in_memory_repo)
+    assert [podcast['id'] for podcast in featured.podcasts()] == [3, 1]
+    add_review_to_podcast(user, 3, "content", in_memory_repo.get_podcast(2), in_memory_repo)
+    add_review_to_podcast(user, 3, "content", in_memory_repo.get_podcast(2), in_memory_repo)
+    assert [podcast['id'] for podcast in featured.podcasts()] == [2, 3]
+
 def test_add_user(in_memory_repo):
     username = 'newuser'
     password = 'password123'
@@ -234,6 +313,35 @@ def test_get_podcasts_from_language(in_memory_repo):
     for podcast in podcasts:
         assert language.lower() in podcast.language.lower()
 
+def test_search_services_match_a_full_scan(in_memory_repo):
+    podcasts = in_memory_repo.get_all_podcasts()
+    for query in ["a", "ra", "rad", "Radio", "the daily", "zzz"]:
+        expected = sorted(p for p in podcasts if query.lower() in p.title.lower())
+        assert get_podcasts_from_title(query, in_memory_repo) == expected
+    for query in ["an", "denny", "Media"]:
+        expected = sorted(p for p in podcasts if query.lower() in p.author.name.lower())
+        assert get_podcasts_from_author(query, in_memory_repo) == expected
+    for query in ["s", "news", "Society & Culture"]:
+        expected = sorted(p for p in podcasts if any(query.lower() in c.name.lower() for c in p.categories))
+        assert get_podcasts_from_category(query, in_memory_repo) == expected
+    for query in ["e", "english", "Spanish"]:
+        expected = sorted(p for p in podcasts if query.lower() in p.language.lower())
+        assert get_podcasts_from_language(query, in_memory_repo) == expected
+
+def test_search_podcasts_returns_one_page(in_memory_repo):
+    matches = get_podcasts_from_title("Radio", in_memory_repo)
+
+    results = search_podcasts("Radio", "Title", 2, in_memory_repo)
+
+    assert results['number_of_pages'] == (len(matches) + 9) // 10
+    assert [podcast['id'] for podcast in results['podcasts']] == [podcast.id for podcast in matches[10:20]]
+
+def test_search_podcasts_without_input(in_memory_repo):
+    assert search_podcasts("", "Title", 1, in_memory_repo) == {'podcasts': [], 'number_of_pages': 0,
+                                                               'next_cursor': None}
+    assert search_podcasts("Radio", None, 1, in_memory_repo) == {'podcasts': [], 'number_of_pages': 0,
+                                                                 'next_cursor': None}
+
 def test_get_page(in_memory_repo):
     podcasts = in_memory_repo.get_all_podcasts()
     page = 1
@@ -243,3 +351,51 @@ def test_get_page(in_memory_repo):
 
     assert len(paginated_podcasts) <= items_per_page  # Ensure only 10 or fewer items are returned
     assert paginated_podcasts == podcasts[0:items_per_page]
+
+
+def test_podcast_summary_is_reused_until_the_podcast_changes(in_memory_repo):
+    podcast = in_memory_repo.get_podcast(1)
+
+    summary = podcast_summary(podcast)
+    assert summary['title'] == podcast.title
+    assert summary['author'] == podcast.author.name
+    assert podcast_summary(podcast) is summary
+    with pytest.raises(TypeError):
+        summary['title'] = "Changed"
+
+    podcast.title = "Retitled"
+    assert podcast_summary(podcast)['title'] == "Retitled"
+    podcast.author.name = "Renamed"
+    assert podcast_summary(podcast)['author'] == "Renamed"
+
+    # Another podcast object with the same id, as the next test's repository might hold, is not given this view.
+    other = Podcast(1, Author(1, "Other author"), "Other")
+    assert podcast_summary(other)['title'] == "Other"
+
+
+def test_podcast_detail_follows_episodes_but_not_reviews(in_memory_repo):
+    podcast = in_memory_repo.get_podcast(1)
+    detail = podcast_detail(podcast)
+    assert detail['categories'] == tuple(category.name for category in podcast.categories)
+    assert 'reviews' not in detail
+
+    user = User(1, "user", "Password123")
+    add_review_to_podcast(user, 4, "Good", podcast, in_memory_repo)
+    assert podcast_detail(podcast) is detail
+    assert len(get_podcast_data(1, in_memory_repo)['reviews']) == 1
+
+    episode = Episode(99999, 1, 60, "AAA first episode")
+    podcast.add_episode(episode)
+    assert podcast_detail(podcast)['episodes'][0] is episode
+
+
+def test_search_podcasts_follows_the_next_cursor(in_memory_repo):
+    matches = get_podcasts_from_title("Radio", in_memory_repo)
+
+    page = search_podcasts("Radio", "Title", 1, in_memory_repo)
+    listed = [podcast['id'] for podcast in page['podcasts']]
+    while page['next_cursor'] is not None:
+        page = search_podcasts("Radio", "Title", 1, in_memory_repo, after=page['next_cursor'])
+        listed += [podcast['id'] for podcast in page['podcasts']]
+
+    assert listed == [podcast.id for podcast in matches]
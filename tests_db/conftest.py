@@ -32,6 +32,7 @@ def database_engine():
     populate_database(repo_instance, TEST_DATA_PATH_DATABASE_LIMITED)
     yield engine
     metadata.drop_all(engine)
+    clear_mappers()
 
 @pytest.fixture
 def session_factory():
@@ -49,6 +50,7 @@ def session_factory():
     populate_database(repo_instance, TEST_DATA_PATH_DATABASE_LIMITED)
     yield session_factory
     metadata.drop_all(engine)
+    clear_mappers()
 
 @pytest.fixture
 def empty_session():
@@ -60,4 +62,5 @@ def empty_session():
     map_model_to_tables()
     session_factory = sessionmaker(bind=engine)
     yield session_factory()
-    metadata.drop_all(engine)
\ No newline at end of file
+    metadata.drop_all(engine)
+    clear_mappers()
\ No newline at end of file
@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy.pool import NullPool, QueuePool
+
+from podcast.adapters.databaseEngine import create_database_engine
+
+
+@pytest.mark.parametrize('pool, pool_class', [('null', NullPool), ('queue', QueuePool)])
+def test_engine_uses_the_configured_pool(tmp_path, pool, pool_class):
+    engine = create_database_engine(f'sqlite:///{tmp_path / "podcast.db"}', pool=pool)
+    assert isinstance(engine.pool, pool_class)
+    engine.dispose()
+
+
+@pytest.mark.parametrize('pool', ['null', 'queue'])
+def test_sqlite_connections_are_tuned_when_opened(tmp_path, pool):
+    engine = create_database_engine(f'sqlite:///{tmp_path / "podcast.db"}', pool=pool)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        # NORMAL
+        assert connection.exec_driver_sql('PRAGMA synchronous').scalar() == 1
+        assert connection.exec_driver_sql('PRAGMA cache_size').scalar() == -16384
+        # MEMORY
+        assert connection.exec_driver_sql('PRAGMA temp_store').scalar() == 2
+    engine.dispose()
+
+
+def test_pooled_connections_are_reused(tmp_path):
+    engine = create_database_engine(f'sqlite:///{tmp_path / "podcast.db"}', pool='queue')
+    with engine.connect() as connection:
+        first = connection.connection.dbapi_connection
+    with engine.connect() as connection:
+        assert connection.connection.dbapi_connection is first
+    engine.dispose()
+
+
+def test_unknown_pool_is_rejected():
+    with pytest.raises(ValueError):
+        create_database_engine('sqlite://', pool='singleton')
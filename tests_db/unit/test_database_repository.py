@@ -1,9 +1,16 @@
+from contextlib import contextmanager
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, clear_mappers
-from podcast.adapters.orm import metadata, map_model_to_tables
+from podcast.adapters.orm import metadata, map_model_to_tables, podcast_ratings_table
 from podcast.adapters.databaseRepository import SqlAlchemyRepository
 from podcast.domainmodel.model import Author, Podcast, Episode, Category, Review, User, Playlist
+from podcast.description.services import podcast_to_dict
+from podcast.home.services import FeaturedPodcasts
+from podcast import serialisation
+from podcast.serialisation import podcast_detail, podcast_summary
+from podcast.adapters.memoryRepository import MemoryRepository, populate
+from tests_db.conftest import TEST_DATA_PATH_DATABASE_LIMITED
 
 
 
@@ -23,6 +30,22 @@ def find_next_id(database_repo, model_class):
     return new_id
 
 
+@contextmanager
+def recorded_statements(database_repo):
+    """ Collects the (statement, parameters) pairs the repository's engine executes inside the block. """
+    bind = database_repo._session_cm.session.get_bind()
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(bind, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, 'before_cursor_execute', record)
+
+
 def test_add_podcast(database_repo):
     # Find the next available author id
     author_id = find_next_id(database_repo, Author)
@@ -42,6 +65,70 @@ def test_add_podcast(database_repo):
     assert retrieved == podcast
 
 
+def test_search_podcasts(database_repo):
+    podcasts = database_repo.get_all_podcasts()
+
+    expected = sorted(p for p in podcasts if "radio" in p.title.lower())
+    assert len(expected) > 0
+    assert database_repo.search_podcasts("Radio", "title") == expected
+
+    expected = sorted(p for p in podcasts if "denny" in p.author.name.lower())
+    assert database_repo.search_podcasts("denny", "author") == expected
+
+    expected = sorted(p for p in podcasts if any("news" in c.name.lower() for c in p.categories))
+    assert database_repo.search_podcasts("News", "category") == expected
+
+    for query in ["a", "fr", "100%", "_%", 'say "hi"', "the daily"]:
+        expected = sorted(p for p in podcasts if query.lower() in p.title.lower())
+        assert database_repo.search_podcasts(query, "title") == expected
+        assert database_repo.count_search_results(query, "title") == len(expected)
+
+    expected = sorted(p for p in podcasts if "english" in p.language.lower())
+    assert database_repo.search_podcasts("English", "language", 20, 10) == expected[20:30]
+
+    for field in ("title", "author", "category", "language"):
+        assert database_repo.search_podcasts("ab\x00cd", field) == database_repo.search_podcasts("abcd", field)
+        assert database_repo.count_search_results("en\x01g\x7f", field) == \
+            database_repo.count_search_results("eng", field)
+
+
+def test_search_podcasts_page(database_repo):
+    expected = database_repo.search_podcasts("radio", "title")
+
+    page = database_repo.search_podcasts_page("radio", "title", 10, offset=10)
+    assert page.items == expected[10:20]
+    assert page.total == len(expected)
+
+    page = database_repo.search_podcasts_page("radio", "title", 10, after=page.next_cursor)
+    assert page.items == expected[20:30]
+
+    page = database_repo.search_podcasts_page("radio", "title", 10, offset=len(expected) - 3)
+    assert page.items == expected[-3:]
+    assert page.next_cursor is None
+
+
+def test_search_podcasts_follows_updates(database_repo):
+    podcast = database_repo.get_podcast(1)
+    podcast.title = "Zyxwvut Podcast"
+    database_repo.add_podcast(podcast)
+    assert database_repo.search_podcasts("zyxwvut", "title") == [podcast]
+
+    podcast.author.name = "Qwertyuiop"
+    database_repo.add_author(podcast.author)
+    assert database_repo.search_podcasts("qwertyuiop", "author") == [podcast]
+
+
+def test_get_previous_and_next_podcast_ids(database_repo):
+    podcasts = sorted(database_repo.get_all_podcasts(), key=lambda podcast: podcast.title.lower())
+
+    for index in [0, 1, len(podcasts) // 2, len(podcasts) - 1]:
+        previous_id = podcasts[index - 1].id if index > 0 else None
+        next_id = podcasts[index + 1].id if index < len(podcasts) - 1 else None
+        assert database_repo.get_previous_and_next_podcast_ids(podcasts[index].id) == (previous_id, next_id)
+
+    assert database_repo.get_previous_and_next_podcast_ids(0) == (None, None)
+
+
 def test_add_episode(database_repo):
     # Find the next available ids
     author_id = find_next_id(database_repo, Author)
@@ -127,6 +214,252 @@ def test_add_playlist(database_repo):
     assert retrieved == playlist
 
 
+def test_get_playlists_by_user(database_repo):
+    user = User(find_next_id(database_repo, User), "user1", "password")
+    other_user = User(user.id + 1, "user2", "password")
+    playlist_id = find_next_id(database_repo, Playlist)
+    database_repo.add_user(user)
+    database_repo.add_user(other_user)
+    database_repo.add_playlist(Playlist(playlist_id, user, "First"))
+    database_repo.add_playlist(Playlist(playlist_id + 1, other_user, "Others"))
+    database_repo.add_playlist(Playlist(playlist_id + 2, user, "Second"))
+
+    playlists = database_repo.get_playlists_by_user(user)
+    assert [playlist.name for playlist in playlists] == ["First", "Second"]
+    assert database_repo.get_playlist_by_user(user).name == "First"
+    assert database_repo.get_playlist_by_user(User(other_user.id + 1, "user3", "password")) is None
+
+
+def test_get_playlist_by_user_uses_the_owner_index(database_repo):
+    user_id = find_next_id(database_repo, User)
+    user = User(user_id, "user1", "password")
+    database_repo.add_user(user)
+    database_repo.add_playlist(Playlist(find_next_id(database_repo, Playlist), user, "My Playlist"))
+    session = database_repo._session_cm.session
+    session.expunge_all()
+    user = database_repo.get_user(user_id)
+    with recorded_statements(database_repo) as statements:
+        playlist = database_repo.get_playlist_by_user(user)
+        list(playlist.episodes)
+
+    # One query for the playlist and one for its episodes, which are not loaded lazily afterwards.
+    assert len(statements) == 2
+    statement, parameters = statements[0]
+    plan = session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    assert 'USING INDEX ix_playlists_owner_id' in plan[0][-1]
+
+
+def test_get_podcasts_by_ids_reads_only_those_podcasts(database_repo):
+    database_repo.close_session()
+    podcasts = database_repo.get_podcasts_by_ids([3, 1, 99999, 2])
+    assert [podcast.id for podcast in podcasts] == [3, 1, 2]
+    assert database_repo.session_statistics() == (3 + len({podcast.author.id for podcast in podcasts}), 1)
+    assert database_repo.get_podcasts_by_ids([]) == []
+
+
+def test_views_of_loaded_podcasts_are_not_cached(database_repo):
+    serialisation._summaries.clear()
+    serialisation._details.clear()
+
+    podcast = database_repo.get_podcast_details(1)
+    assert podcast.version is None
+    assert podcast_detail(podcast)['title'] == podcast.title
+    assert podcast_summary(podcast)['id'] == 1
+    assert serialisation._summaries == {} and serialisation._details == {}
+
+
+def test_session_statistics_cover_the_current_session_only(database_repo):
+    database_repo.close_session()
+    assert database_repo.session_statistics() == (0, 0)
+
+    podcast = database_repo.get_podcast(1)
+    episodes = list(podcast.episodes)
+    statistics = database_repo.session_statistics()
+    assert statistics.query_count >= 2
+    assert statistics.identity_map_size >= 1 + len(episodes)
+
+    first_session = database_repo._session_cm.session()
+    database_repo.close_session()
+    assert database_repo.session_statistics() == (0, 0)
+    assert database_repo.get_podcast(1) is not podcast
+    assert database_repo._session_cm.session() is not first_session
+
+
+def test_podcast_details_are_loaded_in_a_fixed_number_of_queries(database_repo):
+    for review_id, username in enumerate(("reviewer1", "reviewer2"), start=find_next_id(database_repo, Review)):
+        user = User(find_next_id(database_repo, User), username, "password")
+        database_repo.add_user(user)
+        database_repo.add_review(Review(review_id, database_repo.get_podcast(1), user, 4, "Good"))
+    session = database_repo._session_cm.session
+    session.expunge_all()
+    with recorded_statements(database_repo) as statements:
+        podcast_data = podcast_to_dict(database_repo.get_podcast_details(1))
+        usernames = [review.user.username for review in podcast_data['reviews']]
+
+    assert len(podcast_data['episodes']) > 1
+    assert len(podcast_data['categories']) > 0
+    assert sorted(usernames) == ["reviewer1", "reviewer2"]
+    # The podcast with its author, then its categories, episodes, and reviews with their users.
+    assert len(statements) == 4
+    assert database_repo.get_podcast_details(999999) is None
+
+
+def test_rating_summary_follows_the_reviews(database_repo):
+    podcast = database_repo.get_podcast(1)
+    user = User(find_next_id(database_repo, User), "reviewer", "password")
+    database_repo.add_user(user)
+    review_id = find_next_id(database_repo, Review)
+    assert database_repo.get_rating_summary(1) == (0, 0, (0, 0, 0, 0, 0))
+
+    database_repo.add_review_to_podcast(Review(review_id, podcast, user, 5, "Great"), podcast)
+    database_repo.add_review(Review(review_id + 1, podcast, user, 2, "Poor"))
+    summary = database_repo.get_rating_summary(1)
+    assert (summary.count, summary.total, summary.histogram) == (2, 7, (0, 1, 0, 0, 1))
+    assert summary.average == 3.5
+
+    session = database_repo._session_cm.session
+    database_repo.get_review(review_id + 1).rating = 3
+    session.commit()
+    assert database_repo.get_rating_summary(1).histogram == (0, 0, 1, 0, 1)
+    session.delete(database_repo.get_review(review_id))
+    session.commit()
+    assert database_repo.get_rating_summary(1) == (1, 3, (0, 0, 1, 0, 0))
+
+
+def test_leaderboards_match_the_memory_repository(database_repo):
+    memory_repo = MemoryRepository()
+    populate(memory_repo, TEST_DATA_PATH_DATABASE_LIMITED)
+    user = User(find_next_id(database_repo, User), "reviewer", "password")
+    database_repo.add_user(user)
+    review_id = find_next_id(database_repo, Review)
+    for podcast_id in range(1, 40):
+        for rating in (podcast_id % 5 + 1, podcast_id % 3 + 3, podcast_id % 2 + 1)[:podcast_id % 3 + 1]:
+            database_repo.add_review(Review(review_id, database_repo.get_podcast(podcast_id), user, rating, "x"))
+            memory_repo.add_review(Review(review_id, memory_repo.get_podcast(podcast_id), user, rating, "x"))
+            review_id += 1
+
+    for leaderboard in ('top-rated', 'most-reviewed'):
+        for scope in ({}, {'category': 'Comedy'}, {'language': 'English'}, {'language': 'eNGLISH'}):
+            expected = [(entry.podcast.id, entry.rating) for entry in memory_repo.get_leaderboard(leaderboard, 8, **scope)]
+            assert len(expected) > 1
+            assert [(entry.podcast.id, entry.rating)
+                    for entry in database_repo.get_leaderboard(leaderboard, 8, **scope)] == expected
+
+
+def test_leaderboard_skips_ratings_without_a_podcast(database_repo):
+    user = User(find_next_id(database_repo, User), "reviewer", "password")
+    database_repo.add_user(user)
+    review_id = find_next_id(database_repo, Review)
+    for podcast_id, rating in [(1, 3), (2, 4), (3, 5)]:
+        database_repo.add_review(Review(review_id, database_repo.get_podcast(podcast_id), user, rating, "x"))
+        review_id += 1
+    # A ratings row for a podcast that is not stored, ranked between the others.
+    session = database_repo._session_cm.session
+    session.execute(podcast_ratings_table.insert().values(podcast_id=99999, review_count=1, rating_total=4,
+                                                          rating_1=0, rating_2=0, rating_3=0, rating_4=1, rating_5=0))
+    session.commit()
+
+    entries = database_repo.get_leaderboard('top-rated', 10)
+    assert [(entry.podcast.id, entry.rating.total) for entry in entries] == [(3, 5), (2, 4), (1, 3)]
+
+
+def test_leaderboards_are_read_in_index_order(database_repo):
+    session = database_repo._session_cm.session
+    with recorded_statements(database_repo) as statements:
+        database_repo.get_leaderboard('top-rated', 10, category='Comedy')
+        database_repo.get_leaderboard('most-reviewed', 10)
+
+    plans = [' '.join(row[-1] for row in session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement,
+                                                                                parameters))
+             for statement, parameters in statements if 'podcast_ratings' in statement]
+    assert 'INDEX ix_podcast_ratings_top_rated' in plans[0]
+    assert 'INDEX ix_podcast_ratings_most_reviewed' in plans[1]
+    assert all('TEMP B-TREE' not in plan for plan in plans)
+
+
+def test_podcasts_by_letter_match_the_memory_repository(database_repo):
+    memory_repo = MemoryRepository()
+    populate(memory_repo, TEST_DATA_PATH_DATABASE_LIMITED)
+
+    for letter in list('ABCDEFGHIJKLMNOPQRSTUVWXYZ') + ['#']:
+        database_page = database_repo.get_podcasts_by_letter(letter, 3)
+        memory_page = memory_repo.get_podcasts_by_letter(letter, 3)
+        while True:
+            assert [podcast.id for podcast in database_page.items] == [podcast.id for podcast in memory_page.items]
+            assert (database_page.total, database_page.next_cursor) == (memory_page.total, memory_page.next_cursor)
+            if database_page.next_cursor is None:
+                break
+            database_page = database_repo.get_podcasts_by_letter(letter, 3, after=database_page.next_cursor)
+            memory_page = memory_repo.get_podcasts_by_letter(letter, 3, after=memory_page.next_cursor)
+    assert database_repo.get_podcasts_by_letter('#', 3).total > 0
+
+
+def test_podcasts_by_letter_page_through_non_ascii_titles(database_repo):
+    author = Author(find_next_id(database_repo, Author), "Auteur")
+    podcast_id = find_next_id(database_repo, Podcast)
+    titles = ["Écho", "ÉCOLE", "Ébène", "écrire", "élan", "Étoile"]
+    for offset, title in enumerate(titles):
+        database_repo.add_podcast(Podcast(podcast_id + offset, author, title))
+    added = set(range(podcast_id, podcast_id + len(titles)))
+
+    listed = []
+    page = database_repo.get_podcasts_by_letter('#', 1)
+    while True:
+        listed += [podcast.id for podcast in page.items]
+        if page.next_cursor is None:
+            break
+        page = database_repo.get_podcasts_by_letter('#', 1, after=page.next_cursor)
+
+    assert len(listed) == len(set(listed)) == page.total
+    assert added <= set(listed)
+
+
+def test_podcasts_by_letter_are_read_in_index_order(database_repo):
+    session = database_repo._session_cm.session
+    with recorded_statements(database_repo) as statements:
+        first_page = database_repo.get_podcasts_by_letter('S', 2)
+        database_repo.get_podcasts_by_letter('S', 2, after=first_page.next_cursor)
+
+    plans = [' '.join(row[-1] for row in session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement,
+                                                                             parameters))
+             for statement, parameters in statements]
+    assert len(plans) == 4
+    assert all('INDEX ix_podcasts_first_letter' in plan for plan in plans)
+    assert all('TEMP B-TREE' not in plan for plan in plans)
+    # The page after the cursor is found by seeking into the index rather than skipping the rows before it.
+    assert 'first_letter=? AND <expr>>?' in plans[2]
+
+
+def test_change_version_counts_writes(database_repo):
+    version = database_repo.get_change_version()
+
+    database_repo.get_podcast(1)
+    database_repo.get_leaderboard('top-rated', 10)
+    assert database_repo.get_change_version() == version
+
+    user = User(find_next_id(database_repo, User), "versioned", "Password123")
+    database_repo.add_user(user)
+    podcast = database_repo.get_podcast(1)
+    database_repo.add_review_to_podcast(Review(find_next_id(database_repo, Review), podcast, user, 4, "Good"), podcast)
+    assert database_repo.get_change_version() == version + 2
+
+    # The count is kept in the database, so every repository on it sees the same version.
+    other_repo = SqlAlchemyRepository(sessionmaker(bind=database_repo._session_cm.session.get_bind()))
+    assert other_repo.get_change_version() == version + 2
+
+
+def test_featured_podcasts_follow_reviews_posted_by_another_worker(database_repo):
+    other_repo = SqlAlchemyRepository(sessionmaker(bind=database_repo._session_cm.session.get_bind()))
+    featured = FeaturedPodcasts(other_repo, 'top-rated', podcast_ids=[1, 2], size=2)
+    assert [podcast['id'] for podcast in featured.podcasts()] == [1, 2]
+
+    user = User(find_next_id(database_repo, User), "featured", "Password123")
+    database_repo.add_user(user)
+    podcast = database_repo.get_podcast(3)
+    database_repo.add_review_to_podcast(Review(find_next_id(database_repo, Review), podcast, user, 5, "Great"), podcast)
+    assert [podcast['id'] for podcast in featured.podcasts()] == [3, 1]
+
+
 def test_add_user(database_repo):
     # Find the next available user id
     user_id = find_next_id(database_repo, User)
@@ -151,6 +484,19 @@ def test_get_user_by_username(database_repo):
     # Retrieve and check the user by username
     retrieved = database_repo.get_user_by_username("user1")
     assert retrieved == user
+    assert database_repo.get_user_by_username(" user1 ") == user
+    assert database_repo.get_user_by_username("User1") is None
+
+
+def test_get_user_by_username_uses_the_unique_index(database_repo):
+    session = database_repo._session_cm.session
+    with recorded_statements(database_repo) as statements:
+        assert database_repo.get_user_by_username("nobody") is None
+
+    assert len(statements) == 1
+    statement, parameters = statements[0]
+    plan = session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    assert 'USING INDEX sqlite_autoindex_users_1' in plan[0][-1]
 
 
 def test_add_episode_to_playlist(database_repo):
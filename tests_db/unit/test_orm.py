@@ -1,5 +1,8 @@
+import pickle
 import pytest
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import clear_mappers
+from podcast.adapters.orm import map_model_to_tables, create_missing_schema
 from podcast.domainmodel.model import Author, Podcast, Category, User, Playlist, Episode, Review
 
 
@@ -169,3 +172,104 @@ def test_saving_tagged_podcast(empty_session):
     podcast_from_db = empty_session.query(Podcast).get(podcast_key)
     assert len(podcast_from_db.categories) == 1
     assert podcast_from_db.categories[0]._name == "Category"
+
+
+def test_mapped_and_unmapped_domain_objects_pickle(empty_session):
+    author_key = insert_author(empty_session)
+    insert_podcast(empty_session, author_key)
+    author = empty_session.query(Author).get(author_key)
+    assert len(author.podcast_list) == 1
+    loaded = pickle.loads(pickle.dumps(author))
+    assert loaded.name == "Test Author"
+    assert loaded.podcast_list[0].title == "Sample Podcast"
+
+    clear_mappers()
+    podcast = pickle.loads(pickle.dumps(Podcast(1, Author(1, "Unmapped Author"), "Unmapped Podcast")))
+    assert podcast.title == "Unmapped Podcast"
+    assert podcast.author.name == "Unmapped Author"
+
+
+def test_saving_podcast_episodes(empty_session):
+    author_key = insert_author(empty_session)
+    podcast_key = insert_podcast(empty_session, author_key)
+    podcast = empty_session.query(Podcast).get(podcast_key)
+    episodes = [Episode(episode_id, podcast_key, 60, f"Episode {episode_id}") for episode_id in (3, 1, 2)]
+    for episode in episodes + episodes:
+        podcast.add_episode(episode)
+    empty_session.commit()
+
+    assert episodes[0]._podcast is podcast
+    assert list(empty_session.execute('SELECT id FROM episodes ORDER BY id')) == [(1,), (2,), (3,)]
+    empty_session.expire_all()
+    podcast = empty_session.query(Podcast).get(podcast_key)
+    assert sorted(podcast.episodes, key=lambda episode: episode.id) == [episodes[1], episodes[2], episodes[0]]
+    assert episodes[1] in podcast.episodes
+
+
+def test_playlist_order_survives_saving_and_loading(empty_session):
+    user = empty_session.query(User).get(insert_user(empty_session))
+    podcast_key = insert_podcast(empty_session, insert_author(empty_session))
+    episodes = {episode_id: Episode(episode_id, podcast_key, 60, f"Episode {episode_id}") for episode_id in range(1, 5)}
+    empty_session.add_all(episodes.values())
+
+    # The episodes are saved in the same flush as the playlist.
+    playlist = Playlist(1, user, "Ordered", [episodes[3], episodes[1], episodes[2]])
+    empty_session.add(playlist)
+    empty_session.commit()
+    playlist.remove_episode(episodes[1])
+    playlist.add_episode(episodes[4])
+    playlist.add_episode(episodes[1])
+    empty_session.commit()
+
+    assert list(empty_session.execute('SELECT episode_id, position FROM playlist_episodes ORDER BY position')) == \
+        [(3, 0), (2, 2), (4, 3), (1, 4)]
+    empty_session.expire_all()
+    assert [episode.id for episode in empty_session.query(Playlist).get(1).episodes] == [3, 2, 4, 1]
+
+
+def test_create_missing_schema_numbers_existing_playlist_entries(empty_session):
+    connection = empty_session.connection()
+    connection.exec_driver_sql('DROP TABLE playlist_episodes')
+    connection.exec_driver_sql('CREATE TABLE playlist_episodes (playlist_id INTEGER, episode_id INTEGER, '
+                               'PRIMARY KEY (playlist_id, episode_id))')
+    connection.exec_driver_sql('INSERT INTO playlist_episodes VALUES (1, 7), (1, 5), (2, 6)')
+
+    create_missing_schema(connection)
+
+    assert list(connection.exec_driver_sql('SELECT episode_id FROM playlist_episodes WHERE playlist_id = 1 '
+                                           'ORDER BY position')) == [(7,), (5,)]
+
+
+def test_create_missing_schema_totals_existing_reviews(empty_session):
+    podcast_id = insert_podcast(empty_session, insert_author(empty_session))
+    user_id = insert_user(empty_session)
+    connection = empty_session.connection()
+    connection.exec_driver_sql('DROP TABLE podcast_ratings')
+    for trigger in ('insert', 'delete', 'update'):
+        connection.exec_driver_sql(f'DROP TRIGGER podcast_ratings_review_{trigger}')
+    for rating in (4, 4, 1):
+        connection.exec_driver_sql('INSERT INTO reviews (podcast_id, user_id, rating, content) VALUES (?, ?, ?, ?)',
+                                   (podcast_id, user_id, rating, "content"))
+
+    create_missing_schema(connection)
+
+    assert list(connection.exec_driver_sql('SELECT * FROM podcast_ratings')) == [(podcast_id, 3, 9, 1, 0, 0, 2, 0)]
+    connection.exec_driver_sql('INSERT INTO reviews (podcast_id, user_id, rating, content) VALUES (?, ?, 5, ?)',
+                               (podcast_id, user_id, "content"))
+    assert list(connection.exec_driver_sql('SELECT review_count, rating_total FROM podcast_ratings')) == [(4, 14)]
+
+
+def test_create_missing_schema_adds_the_first_letter_column(empty_session):
+    connection = empty_session.connection()
+    connection.exec_driver_sql('DROP INDEX ix_podcasts_first_letter')
+    connection.exec_driver_sql('ALTER TABLE podcasts DROP COLUMN first_letter')
+    author_id = insert_author(empty_session)
+    for title in ("zebra", "99 Problems"):
+        insert_podcast(empty_session, author_id, title)
+
+    create_missing_schema(connection)
+
+    assert list(connection.exec_driver_sql('SELECT first_letter, title FROM podcasts ORDER BY first_letter')) == \
+        [('#', "99 Problems"), ('Z', "zebra")]
+    assert connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE name = 'ix_podcasts_first_letter'").scalar() == 1
@@ -1,9 +1,15 @@
-from sqlalchemy import inspect, select
-from podcast.adapters.orm import metadata
+from sqlalchemy import create_engine, inspect, select
+from sqlalchemy.orm import sessionmaker
+from podcast.adapters.databaseRepository import SqlAlchemyRepository, load_data
+from podcast.adapters.datareader.csvdatareader import CSVDataReader
+from podcast.adapters.orm import metadata, _podcast_search_trigger_names
+
+from tests_db.conftest import TEST_DATA_PATH_DATABASE_LIMITED, TEST_DATABASE_URI_IN_MEMORY
 
 def test_database_populate_inspect_table_names(database_engine):
     inspector = inspect(database_engine)
-    assert set(inspector.get_table_names()) == {'authors', 'podcasts', 'categories', 'podcast_categories', 'episodes', 'users', 'subscriptions', 'reviews', 'playlists', 'playlist_episodes'}
+    assert set(inspector.get_table_names()) == {'authors', 'podcasts', 'categories', 'podcast_categories', 'episodes', 'users', 'subscriptions', 'reviews', 'playlists', 'playlist_episodes',
+                                                'podcast_ratings', 'repository_version', 'podcast_search', 'podcast_search_config', 'podcast_search_content', 'podcast_search_data', 'podcast_search_docsize', 'podcast_search_idx'}
 
 def test_database_populate_select_all_authors(database_engine):
     inspector = inspect(database_engine)
@@ -22,10 +28,7 @@ def test_database_populate_select_all_authors(database_engine):
 
 
 def test_database_populate_select_all_podcasts(database_engine):
-    inspector = inspect(database_engine)
-    name_of_podcasts_table = inspector.get_table_names()[6]  # Assuming 'podcasts' is second
-
-    podcasts_table = metadata.tables[name_of_podcasts_table]
+    podcasts_table = metadata.tables['podcasts']
 
     with database_engine.connect() as connection:
         select_statement = select([podcasts_table])
@@ -51,3 +54,46 @@ def test_database_populate_select_all_podcasts(database_engine):
 
     expected_count = 1000  # Replace with actual expected count
     assert len(all_podcasts) == expected_count, f"Expected {expected_count} podcasts, but found {len(all_podcasts)}."
+
+
+def test_database_populate_loads_episodes_and_restores_pragmas(database_engine):
+    with database_engine.connect() as connection:
+        assert connection.exec_driver_sql('SELECT count(*) FROM episodes').scalar() > 0
+        assert connection.exec_driver_sql('SELECT count(*) FROM podcast_search').scalar() == \
+            connection.exec_driver_sql('SELECT count(*) FROM podcasts').scalar()
+        assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'delete'
+        # The search triggers dropped for the load are back.
+        triggers = connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'").scalars().all()
+        assert set(_podcast_search_trigger_names) <= set(triggers)
+        categories = connection.exec_driver_sql(
+            "SELECT categories FROM podcast_search WHERE rowid = (SELECT min(podcast_id) FROM podcast_categories)"
+        ).scalar()
+        assert categories
+
+
+def test_database_populate_in_chunks_matches_a_single_chunk(database_engine):
+    chunked_engine = create_engine(TEST_DATABASE_URI_IN_MEMORY)
+    metadata.create_all(chunked_engine)
+    repo = SqlAlchemyRepository(sessionmaker(bind=chunked_engine))
+    csv_reader = CSVDataReader(TEST_DATA_PATH_DATABASE_LIMITED)
+    load_data(csv_reader.iter_podcasts(), csv_reader.iter_episodes(), repo, chunk_size=7)
+
+    for table in ('authors', 'categories', 'podcasts', 'podcast_categories', 'episodes'):
+        query = f'SELECT * FROM {table} ORDER BY 1, 2'
+        with database_engine.connect() as expected, chunked_engine.connect() as actual:
+            assert actual.exec_driver_sql(query).fetchall() == expected.exec_driver_sql(query).fetchall()
+    metadata.drop_all(chunked_engine)
+
+
+def test_database_populations_start_different_change_versions():
+    versions = set()
+    for _ in range(2):
+        engine = create_engine(TEST_DATABASE_URI_IN_MEMORY)
+        metadata.create_all(engine)
+        repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+        csv_reader = CSVDataReader(TEST_DATA_PATH_DATABASE_LIMITED)
+        load_data(csv_reader.iter_podcasts(), csv_reader.iter_episodes(), repo)
+        versions.add(repo.get_change_version())
+        metadata.drop_all(engine)
+    # A database file replaced by a newly populated one must not repeat the ETags of the old one.
+    assert len(versions) == 2